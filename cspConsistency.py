@@ -10,15 +10,83 @@
 
 # This code is specialized to work in a Jupter Notebook environment, but it should still work otherwise
 
-from utilities import Displayable
+from utilities import Displayable, Budget, Budget_exhausted
+from cspProblem import Constraint, Bitset_domains, Interval_domain
+from itertools import product
+import copy
+import math
+import random
+from collections import OrderedDict
+from operator import lt,le,eq,ne,ge,gt
+try:
+    import numpy
+except ImportError:   # the "vector" engine then behaves like "ac3"
+    numpy = None
 
 class Con_solver(Displayable):
-    def __init__(self, csp, domains=None):
+    """A solver for a CSP using arc consistency and domain splitting.
+
+    engine selects how arcs are revised:
+    * "ac3" searches for a support for every value on every revision
+    * "ac3rm" remembers the last support found for each (variable,value,constraint)
+      and only searches again when that support has been pruned (AC-3rm)
+    * "table" compiles the constraints into extensional Support_tables once
+      (see CSP.compile) and revises with bitwise operations
+    * "vector" evaluates binary comparisons (lt, le, eq, ne, ge, gt) on numeric
+      domains as NumPy array operations over all pairs of values at once
+    Whatever the engine, a binary comparison where a domain is an
+    Interval_domain is revised by bounds consistency (see revise_bounds), so
+    large integer ranges are not enumerated.
+    var_order selects the variable to split on; it is either a function
+    f(solver,variables) that returns one of variables, or the name of one of the
+    heuristics in var_orders: "first", "mrv", "degree" or "dom/wdeg".
+    split selects how the domain of that variable is split; it is either a
+    function f(solver,var) that returns a list of disjoint non-empty sets of
+    values, to be tried in order, that cover the domain, or the name of one of
+    the strategies in domain_splits: "half", "bisect", "enumerate", "lcv" or "random".
+    stats counts the constraint checks; it is shared by all copies of the solver.
+    Revising an arc with a Support_table or a constraint's own propagator
+    counts one check per value of the variable, and a bounds revision one check.
+    If trail is a list, each change to a domain is recorded on it so that it
+    can be undone (see solve_one_trail).
+    The CSP can be edited after the domains have been made arc consistent
+    (see add_constraint, tighten_domain, reset_domain and retract_constraint);
+    arc consistency is then restored by revising only the arcs the edit affects.
+    add_constraint and retract_constraint change the CSP object itself, so
+    every other solver for that CSP (e.g., for the examples in cspExamples)
+    sees the change too.
+    base_domains are the domains before propagation, including the edits;
+    each copy of the solver has its own.
+    cache is None, the maximum number of entries of a new Fixpoint_cache, or a
+    Fixpoint_cache for csp (which can be shared by several solvers); when it
+    is given, make_arc_consistent reuses the results for domains seen before.
+    If budget is a Budget, each node of the search is charged to it, and the
+    search raises Budget_exhausted when it is used up (see solve_within).
+    """
+    def __init__(self, csp, domains=None, engine="ac3", var_order="first",
+                 split="half", cache=None):
         self.csp=csp
         if domains is not None:
             self.domains = domains
         else:
             self.domains = csp.domains.copy()
+        self.engine = engine
+        if engine == "table":
+            csp.compile()
+        self.residues = {}  # (var,val,const) -> supporting tuple, shared by copies
+        self.stats = {"checks":0}
+        self.var_order = var_order
+        self.split = split
+        self.weights = {}   # const -> weight for dom/wdeg, shared by copies
+        self.budget = None
+        self.trail = None   # list of (var,old domain) when changes are undoable
+        self.base_domains = self.domains.copy()
+        if cache is None or isinstance(cache,Fixpoint_cache):
+            self.cache = cache   # shared by copies
+        else:
+            self.cache = Fixpoint_cache(csp,cache)
+        if self.cache is not None and self.cache.csp is not csp:
+            raise ValueError("Fixpoint_cache is for a different CSP")
 
     def __repr__(self):
         return str(self.domains)
@@ -32,24 +100,285 @@ class Con_solver(Displayable):
                              for var in const.scope}
         else:
             to_do = to_do.copy()  # use a copy of to_do
+        if self.cache is not None:
+            key = self.fingerprint()
+            fixpoint = self.cache.get(key)
+            if fixpoint is not None:
+                self.display(2,"AC result found in the cache")
+                self.restore_fixpoint(fixpoint)
+                return
         self.display(4,"AC starting",self.domains)
         while to_do:
             #Select arc, determine if it is consistent, prune, add arcs to to-do list, mark arc as consistent
             var,const = to_do.pop()
             self.display(2,"Processing arc (",var,",",const,")")
-            other_vars = [ov for ov in const.scope if ov is not var]
-            new_domain = {val for val in self.domains[var]
-                          if self.any_holds(const,{var:val},other_vars,0)}
-            removed_vars = self.domains[var] - new_domain
+            new_domain = self.revise(var,const)
             if new_domain != self.domains[var]:
+                removed_vars = self.domains[var] - new_domain
+                if isinstance(removed_vars,Interval_domain):
+                    removed_vars = [removed_vars]  # displayed as a whole, not value by value
                 self.display(4,"Arc: (",var,",",const,") is inconsistent")
                 self.display(3,"Domain pruned","dom(",var,") =",new_domain," due to ",const, varName=removed_vars)
-                self.domains[var] = new_domain
+                if not new_domain:
+                    self.weights[const] = self.weights.get(const,1)+1
+                self.set_domain(var,new_domain)
                 add_to_do = self.new_to_do(var,const)
                 to_do |= add_to_do      # set union
                 self.display(3,"  adding",add_to_do if add_to_do else "nothing", "to to_do.")
             self.display(4,"Arc: (",var,",",const,") now consistent")
         self.display(2,"AC done. Reduced domains",self.domains)
+        if self.cache is not None:
+            self.save_fixpoint(key)
+
+    def fingerprint(self):
+        """returns a hashable key that is equal for equal domains"""
+        variables = self.cache.variables if self.cache is not None else self.csp.variables
+        return tuple(self.domains[var].intervals
+                     if isinstance(self.domains[var],Interval_domain)
+                     else frozenset(self.domains[var])
+                     for var in variables)
+
+    def save_fixpoint(self,key):
+        """records the current (arc consistent) domains in the cache as the
+        result for the domains with fingerprint key, as the tuple of the
+        domains of the cache's variables. A wipeout is recorded the same
+        way, so that restoring it gives the same domains as propagating.
+        """
+        self.cache.put(key,tuple(self.domains[var] for var in self.cache.variables))
+
+    def restore_fixpoint(self,fixpoint):
+        """sets the domains to fixpoint, a result from the cache"""
+        for var,dom in zip(self.cache.variables,fixpoint):
+            if dom != self.domains[var]:
+                self.set_domain(var,dom)
+
+    def set_domain(self,var,new_domain):
+        """sets the domain of var to new_domain.
+        If there is a trail, the old domain is recorded on it.
+        """
+        if self.trail is not None:
+            self.trail.append((var,self.domains[var]))
+        self.domains[var] = new_domain
+
+    def undo(self,checkpoint):
+        """undoes the changes to the domains back to checkpoint, a length of the trail"""
+        while len(self.trail) > checkpoint:
+            var,old_domain = self.trail.pop()
+            self.domains[var] = old_domain
+
+    def add_constraint(self,const):
+        """adds const to the CSP, which is changed for all of its solvers,
+        and restores arc consistency.
+        Only the arcs of const are revised at first; arcs of other constraints
+        are revised when a domain they depend on is pruned.
+        Returns False if a domain has become empty and True otherwise.
+        """
+        self.csp.add_constraint(const)
+        if self.cache is not None:
+            self.cache.clear()
+        if self.engine == "table":
+            self.csp.compile()
+        self.make_arc_consistent({(var,const) for var in const.scope})
+        return self.all_nonempty()
+
+    def tighten_domain(self,var,values):
+        """restricts the domain of var to the values in values and restores
+        arc consistency by revising the arcs of the constraints on var.
+        The restriction is kept if constraints are later retracted.
+        Returns False if a domain has become empty and True otherwise.
+        """
+        self.base_domains[var] = self.base_domains[var] & values
+        new_domain = self.domains[var] & values
+        if new_domain != self.domains[var]:
+            self.set_domain(var,new_domain)
+            self.make_arc_consistent(self.new_to_do(var,None))
+        return self.all_nonempty()
+
+    def reset_domain(self,var,domain):
+        """sets the domain of var before propagation to domain, which can be
+        larger than its current domain, and recomputes arc consistency for
+        the variables connected to var (see recompute).
+        For the "table" engine, domain must be a subset of var's domain in the CSP.
+        Returns False if a domain has become empty and True otherwise.
+        """
+        self.base_domains[var] = domain
+        self.recompute({var})
+        return self.all_nonempty()
+
+    def retract_constraint(self,const):
+        """removes const from the CSP, which is changed for all of its solvers,
+        and recomputes arc consistency for the variables that were connected
+        to it (see recompute).
+        Returns False if a domain is still empty and True otherwise.
+        """
+        self.csp.remove_constraint(const)
+        self.weights.pop(const,None)
+        if self.cache is not None:
+            self.cache.clear()
+        self.recompute(set(const.scope))
+        return self.all_nonempty()
+
+    def recompute(self,variables):
+        """restores the domains of the variables connected to variables in the
+        constraint graph to their base domains, and makes them arc consistent.
+        The domains of the other variables do not depend on these, so they
+        are kept.
+        """
+        region = self.csp.connected(variables)
+        self.display(2,"Recomputing the domains of",region)
+        for var in region:
+            if self.domains[var] != self.base_domains[var]:
+                self.set_domain(var,self.base_domains[var])
+        self.make_arc_consistent({(var,const) for rvar in region
+                                  for const in self.csp.var_to_const[rvar]
+                                  for var in const.scope})
+
+    def all_nonempty(self):
+        """returns True if no domain is empty"""
+        return all(len(self.domains[var])>0 for var in self.csp.variables)
+
+    def revise(self,var,const):
+        """returns the values in the domain of var that have a support in const
+        given the current domains of the other variables.
+        """
+        if self.engine == "table" and const.table is not None:
+            self.stats["checks"] += len(self.domains[var])  # one per value revised
+            return const.table.revise(var,self.domains)
+        new_domain = const.revise(var,self.domains)
+        if new_domain is not None:   # the constraint has its own propagator
+            self.stats["checks"] += len(self.domains[var])
+            return new_domain
+        new_domain = self.revise_bounds(var,const)
+        if new_domain is not None:
+            self.stats["checks"] += 1   # the cost does not depend on the domain sizes
+            return new_domain
+        if self.engine == "ac3rm":
+            return self.revise_residual(var,const)
+        if self.engine == "vector":
+            new_domain = self.revise_vector(var,const)
+            if new_domain is not None:
+                return new_domain
+        other_vars = [ov for ov in const.scope if ov is not var]
+        return {val for val in self.domains[var]
+                if self.any_holds(const,{var:val},other_vars,0)}
+
+    def revise_bounds(self,var,const):
+        """bounds consistency revision of the arc (var,const), where const is
+        a binary comparison and one of the domains is an Interval_domain.
+        The domain of var is cut to the values below (or above) the largest
+        (or smallest) value of the other variable, so the cost does not
+        depend on the sizes of the domains.
+        Returns None if it does not apply.
+        """
+        if len(const.scope) != 2 or const.condition not in converse:
+            return None
+        domain = self.domains[var]
+        other = const.scope[1] if const.scope[0] == var else const.scope[0]
+        other_domain = self.domains[other]
+        if not (isinstance(domain,Interval_domain) or isinstance(other_domain,Interval_domain)):
+            return None
+        rel = const.condition if const.scope[0] == var else converse[const.condition]
+        if not other_domain:
+            return domain - domain
+        if rel == eq:
+            return domain & other_domain
+        if rel == ne:
+            return domain - other_domain if len(other_domain)==1 else domain
+        if isinstance(other_domain,Interval_domain):
+            bound = other_domain.upper() if rel in (lt,le) else other_domain.lower()
+        else:
+            bound = max(other_domain) if rel in (lt,le) else min(other_domain)
+        if not isinstance(domain,Interval_domain):
+            return {val for val in domain if rel(val,bound)}
+        elif rel == lt:
+            return domain.clip(hi=math.ceil(bound)-1)
+        elif rel == le:
+            return domain.clip(hi=math.floor(bound))
+        elif rel == gt:
+            return domain.clip(lo=math.floor(bound)+1)
+        else:
+            return domain.clip(lo=math.ceil(bound))
+
+    def revise_residual(self,var,const):
+        """AC-3rm revision of the arc (var,const).
+        A support is a tuple of values in the order of const.scope. The last
+        support found for a value is kept in self.residues and reused while all
+        of its values are still in their domains. A support found for one value
+        is also recorded for the other values in it (multidirectionality).
+        """
+        new_domain = set()
+        for val in self.domains[var]:
+            support = self.residues.get((var,val,const))
+            if support is None or not all(sval in self.domains[v]
+                                          for (v,sval) in zip(const.scope,support)):
+                support = self.find_support(const,var,val)
+                if support is None:
+                    continue
+                for (v,sval) in zip(const.scope,support):
+                    self.residues[(v,sval,const)] = support
+            new_domain.add(val)
+        return new_domain
+
+    max_grid = 1<<22   # the maximum number of pairs of values compared at once
+
+    def revise_vector(self,var,const):
+        """revises the arc (var,const) by comparing all pairs of values with a
+        NumPy operation, and keeping the values that hold for some pair.
+        Returns None if const is not a binary comparison on numeric domains.
+        """
+        ufunc = numpy_comparisons.get(const.condition)
+        if ufunc is None or len(const.scope) != 2:
+            return None
+        values = numpy.array(list(self.domains[var]))
+        other = const.scope[1] if var == const.scope[0] else const.scope[0]
+        ovalues = numpy.array(list(self.domains[other]))
+        if values.dtype.kind not in "iuf" or ovalues.dtype.kind not in "iuf":
+            return None
+        supported = numpy.zeros(len(values), dtype=bool)
+        if len(ovalues) > 0:
+            rows = max(1, self.max_grid//len(ovalues))
+            for start in range(0,len(values),rows):
+                block = values[start:start+rows]
+                if var == const.scope[0]:
+                    grid = ufunc(block[:,None], ovalues[None,:])
+                else:
+                    grid = ufunc(ovalues[None,:], block[:,None])
+                supported[start:start+rows] = grid.any(axis=1)
+        self.stats["checks"] += len(values)*len(ovalues)
+        return set(values[supported].tolist())
+
+    def find_support(self,const,var,val):
+        """returns a tuple of values for const.scope with var=val for which
+        const holds, or None if there is no such tuple.
+        """
+        other_vars = [ov for ov in const.scope if ov != var]
+        env = {var:val}
+        for vals in product(*(self.domains[ov] for ov in other_vars)):
+            env.update(zip(other_vars,vals))
+            self.stats["checks"] += 1
+            if const.holds(env):
+                return tuple(env[v] for v in const.scope)
+        return None
+
+    def select_var(self,variables):
+        """returns the variable in variables to split on, using self.var_order.
+        Returns None if variables is empty.
+        variables is an iterable of the variables with more than one value.
+        """
+        if self.var_order == "first":
+            return select(variables)
+        variables = list(variables)
+        if not variables:
+            return None
+        order = self.var_order if callable(self.var_order) else var_orders[self.var_order]
+        return order(self,variables)
+
+    def split_domain(self,var):
+        """returns a list of disjoint non-empty sets of values that cover the
+        domain of var, in the order they should be tried, using self.split.
+        """
+        split = self.split if callable(self.split) else domain_splits[self.split]
+        return split(self,var)
 
     def new_to_do(self,var,const):
          """returns new elements to be added to to_do after assigning
@@ -67,6 +396,7 @@ class Con_solver(Displayable):
         Warning: this has side effects and changes the elements of env
         """
         if ind==len(other_vars):
+            self.stats["checks"] += 1
             return const.holds(env)
         else:
             var = other_vars[ind]
@@ -82,15 +412,21 @@ class Con_solver(Displayable):
         if var==None then it is just a copy.
         """
         newdoms = self.domains.copy()
+        newbase = self.base_domains.copy()
         if var:
             newdoms[var] = new_domain
-        return Con_solver(self.csp,newdoms)
+            newbase[var] = new_domain
+        newcsp = copy.copy(self)  # shares csp, engine, residues and stats
+        newcsp.domains = newdoms
+        newcsp.base_domains = newbase
+        return newcsp
 
 
     def solve_one(self,to_do=None):
         """return a solution to the current CSP or False if there are no solutions
         to_do is the list of arcs to check
         """
+        self.spend()
         self.make_arc_consistent(to_do)
         if any(len(self.domains[var])==0 for var in self.domains):
             return False
@@ -98,25 +434,359 @@ class Con_solver(Displayable):
             self.display(2,"solution:", {var:select(self.domains[var])  for var in self.domains})
             return {var:select(self.domains[var])  for var in self.domains}
         else:
-            var = select(x for x in self.csp.variables if len(self.domains[x])>1)
+            var = self.select_var(x for x in self.csp.variables if len(self.domains[x])>1)
             if var:
-                split = len(self.domains[var])//2
-                dom1 = set(list(self.domains[var])[:split]) #a nonempty proper subset
-                csp1 = self.copy_with_assign(var,dom1) # copy with dom(var)=dom1
-                dom2 = self.domains[var]-dom1
-                csp2 = self.copy_with_assign(var,dom2) # copy with dom(var)=dom2
-                self.display(3,"...splitting",var,"into",dom1,"and",dom2)
+                doms = self.split_domain(var)
+                self.display(3,"...splitting",var,"into"," and ".join(str(dom) for dom in doms))
                 to_do = self.new_to_do(var,None)
-                return csp1.solve_one(to_do) or csp2.solve_one(to_do) 
+                for dom in doms:
+                    solution = self.copy_with_assign(var,dom).solve_one(to_do)
+                    if solution:
+                        return solution
+                return False
+
+    def solve_one_trail(self,to_do=None):
+        """return a solution to the current CSP or False if there are no solutions
+        to_do is the list of arcs to check
+
+        Unlike solve_one, this does not copy the solver when splitting.
+        The domains are changed in place, each change is recorded on the trail,
+        and the changes are undone back to a checkpoint on backtracking.
+        """
+        if self.trail is None:
+            self.trail = []
+        self.spend()
+        self.make_arc_consistent(to_do)
+        if any(len(self.domains[var])==0 for var in self.domains):
+            return False
+        elif all(len(self.domains[var])==1 for var in self.domains):
+            self.display(2,"solution:", {var:select(self.domains[var])  for var in self.domains})
+            return {var:select(self.domains[var])  for var in self.domains}
+        else:
+            var = self.select_var(x for x in self.csp.variables if len(self.domains[x])>1)
+            doms = self.split_domain(var)
+            self.display(3,"...splitting",var,"into"," and ".join(str(dom) for dom in doms))
+            to_do = self.new_to_do(var,None)
+            for dom in doms:
+                checkpoint = len(self.trail)
+                self.set_domain(var,dom)
+                solution = self.solve_one_trail(to_do)
+                if solution:
+                    return solution
+                self.undo(checkpoint)
+            return False
+
+    def solve_all(self,to_do=None,limit=None):
+        """generates the solutions to the current CSP, each as soon as it is found
+        to_do is the list of arcs to check
+        If limit is given, it stops after limit solutions.
+        """
+        if limit is not None and limit <= 0:
+            return
+        self.spend()
+        self.make_arc_consistent(to_do)
+        if any(len(self.domains[var])==0 for var in self.domains):
+            return
+        elif all(len(self.domains[var])==1 for var in self.domains):
+            self.display(2,"solution:", {var:select(self.domains[var])  for var in self.domains})
+            yield {var:select(self.domains[var])  for var in self.domains}
+        else:
+            var = self.select_var(x for x in self.csp.variables if len(self.domains[x])>1)
+            doms = self.split_domain(var)
+            self.display(3,"...splitting",var,"into"," and ".join(str(dom) for dom in doms))
+            to_do = self.new_to_do(var,None)
+            for dom in doms:
+                for solution in self.copy_with_assign(var,dom).solve_all(to_do,limit):
+                    yield solution
+                    if limit is not None:
+                        limit -= 1
+                        if limit == 0:
+                            return
+
+    def count_solutions(self,to_do=None,limit=None):
+        """returns the number of solutions to the current CSP, without
+        constructing the solutions.
+        to_do is the list of arcs to check
+        If limit is given, it stops counting once limit solutions are found.
+        """
+        self.spend()
+        self.make_arc_consistent(to_do)
+        if any(len(self.domains[var])==0 for var in self.domains):
+            return 0
+        elif all(len(self.domains[var])==1 for var in self.domains):
+            return 1
+        else:
+            var = self.select_var(x for x in self.csp.variables if len(self.domains[x])>1)
+            to_do = self.new_to_do(var,None)
+            count = 0
+            for dom in self.split_domain(var):
+                count += self.copy_with_assign(var,dom).count_solutions(to_do,
+                                None if limit is None else limit-count)
+                if limit is not None and count >= limit:
+                    break
+            return count
+
+    def spend(self):
+        """charges a node to the budget, if there is one.
+        Raises Budget_exhausted if the budget is used up."""
+        if self.budget is not None and self.budget.use(self.stats["checks"]):
+            raise Budget_exhausted(self.budget.reason)
+
+    def solve_within(self,budget):
+        """searches for a solution with solve_one, within budget.
+        Returns (status,solution) where status is "solved", "unsatisfiable",
+        or "unknown" if the budget was used up first (solution is then None).
+        """
+        self.budget = budget
+        try:
+            solution = self.solve_one()
+        except Budget_exhausted as stop:
+            self.display(2,"Search stopped:",stop,"after",budget.nodes,"nodes")
+            return "unknown", None
+        finally:
+            self.budget = None
+        if solution:
+            return "solved", solution
+        else:
+            return "unsatisfiable", None
+
+    def solve_with_restarts(self,budget=None,run_nodes=100):
+        """searches for a solution by a sequence of runs of solve_one from the
+        current domains, each splitting domains randomly (see split_random).
+        Run i stops after luby(i)*run_nodes nodes, unless it finishes.
+        budget (if given) limits all of the runs together.
+        The constraint weights for dom/wdeg are kept between runs.
+        Returns (status,solution) as for solve_within.
+        """
+        run = 1
+        while True:
+            solver = self.copy_with_assign()
+            solver.split = split_random
+            run_budget = Budget(max_nodes=luby(run)*run_nodes, parent=budget)
+            self.display(2,"Run",run,"with a limit of",run_budget.max_nodes,"nodes")
+            status,solution = solver.solve_within(run_budget)
+            if status != "unknown" or (budget is not None and budget.reason):
+                return status,solution
+            run += 1
+
+    def solver_for(self,csp):
+        """returns a solver for csp, a CSP on some of the variables of this
+        solver, with the same settings and with the current domains.
+        """
+        newcsp = copy.copy(self)
+        newcsp.csp = csp
+        newcsp.domains = {var:self.domains[var] for var in self.domains
+                          if var in csp.variables}
+        newcsp.residues = {}
+        newcsp.weights = {}
+        newcsp.trail = None
+        newcsp.base_domains = newcsp.domains.copy()
+        if self.cache is not None:
+            newcsp.cache = Fixpoint_cache(csp,self.cache.maxsize)
+        if self.engine == "table":
+            csp.compile()
+        return newcsp
+
+    def components(self):
+        """returns a solver for each connected component of the constraint graph"""
+        return [self.solver_for(self.csp.sub_csp(component))
+                for component in self.csp.components()]
+
+    def solve_by_components(self):
+        """returns a solution to the current CSP or False if there are no solutions.
+        Each connected component of the constraint graph is solved separately.
+        """
+        solution = {}
+        for component in self.components():
+            self.display(2,"Solving component",set(component.domains))
+            component_solution = component.solve_one_trail()
+            if not component_solution:
+                return False
+            solution.update(component_solution)
+        return solution
+
+    def count_solutions_by_components(self):
+        """returns the number of solutions to the current CSP, which is the
+        product of the numbers of solutions of the connected components.
+        """
+        count = 1
+        for component in self.components():
+            count *= component.count_solutions()
+            if count == 0:
+                break
+        return count
+
+class Fixpoint_cache(object):
+    """A bounded cache of the results of arc consistency for a CSP.
+    It maps the fingerprint of the domains before arc consistency to the
+    arc-consistent domains (some of them empty after a wipeout), as
+    recorded by the solver.
+    When it has more than maxsize entries, the least recently used is removed.
+    It relies on the arcs that the solver does not revise already being
+    consistent, which the solvers ensure, and must be cleared if the
+    constraints change.
+    """
+    def __init__(self, csp, maxsize=10000):
+        self.csp = csp
+        self.maxsize = maxsize
+        self.variables = list(csp.variables)  # the order of the domains in entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,key):
+        """returns the entry for key, or None if there is none"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self,key,entry):
+        """records entry for key, removing the least recently used entry if full"""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """removes all of the entries"""
+        self.entries.clear()
+
+    def hit_rate(self):
+        """the proportion of the lookups that found an entry"""
+        lookups = self.hits+self.misses
+        return self.hits/lookups if lookups else 0
+
+    def __repr__(self):
+        return ("Fixpoint_cache("+str(len(self.entries))+" entries, "
+                +str(self.hits)+" hits, "+str(self.misses)+" misses)")
+
+class Bitset_con_solver(Con_solver):
+    """A Con_solver whose domains are a Bitset_domains: one int per variable,
+    with the variables and values numbered by the Domain_index of the CSP.
+    The constraints are compiled into Support_tables over the same numbering,
+    so arc consistency only uses integer operations, and a copy made when
+    splitting only copies a list of ints.
+    self.domains can still be read and written as a {var:set} dictionary.
+    """
+    def __init__(self, csp, domains=None, var_order="first", split="half",
+                 cache=None):
+        if not isinstance(domains,Bitset_domains):
+            domains = Bitset_domains(csp.domain_index(),
+                                     domains if domains is not None else csp.domains)
+        super().__init__(csp, domains, engine="table", var_order=var_order,
+                         split=split, cache=cache)
+
+    def solver_for(self,csp):
+        """returns a solver for csp, a CSP on some of the variables of this
+        solver, with the same settings and with the current domains.
+        """
+        newcsp = super().solver_for(csp)
+        newcsp.domains = Bitset_domains(csp.domain_index(),newcsp.domains)
+        newcsp.base_domains = newcsp.domains.copy()
+        return newcsp
+
+    def set_domain(self,var,new_domain):
+        """sets the domain of var to new_domain.
+        The trail records the variable number and the old bitset.
+        """
+        num = self.domains.index.var_num[var]
+        if self.trail is not None:
+            self.trail.append((num,self.domains.masks[num]))
+        self.domains[var] = new_domain
+
+    def fingerprint(self):
+        """returns a hashable key that is equal for equal domains"""
+        return tuple(self.domains.masks)
+
+    def save_fixpoint(self,key):
+        """records the current bitsets in the cache as the result for the
+        domains with fingerprint key, including when one of them is empty."""
+        self.cache.put(key,tuple(self.domains.masks))
+
+    def restore_fixpoint(self,fixpoint):
+        """sets the bitsets to fixpoint, a result from the cache"""
+        masks = self.domains.masks
+        for num,mask in enumerate(fixpoint):
+            if masks[num] != mask:
+                if self.trail is not None:
+                    self.trail.append((num,masks[num]))
+                masks[num] = mask
+
+    def undo(self,checkpoint):
+        """undoes the changes to the domains back to checkpoint, a length of the trail"""
+        masks = self.domains.masks
+        while len(self.trail) > checkpoint:
+            num,old_mask = self.trail.pop()
+            masks[num] = old_mask
+
+    def make_arc_consistent(self,to_do=None):
+        """Makes this CSP arc-consistent using generalized arc consistency
+        to_do is a set of (variable,constraint) pairs
+        """
+        if to_do is None:
+            to_do = {(var,const) for const in self.csp.constraints
+                             for var in const.scope}
+        else:
+            to_do = to_do.copy()  # use a copy of to_do
+        if self.cache is not None:
+            key = self.fingerprint()
+            fixpoint = self.cache.get(key)
+            if fixpoint is not None:
+                self.display(2,"AC result found in the cache")
+                self.restore_fixpoint(fixpoint)
+                return
+        masks = self.domains.masks
+        index = self.domains.index
+        self.display(4,"AC starting",self.domains)
+        while to_do:
+            var,const = to_do.pop()
+            self.display(2,"Processing arc (",var,",",const,")")
+            num = index.var_num[var]
+            self.stats["checks"] += bin(masks[num]).count("1")  # one per value revised
+            if const.table is not None:
+                new_mask = const.table.revise_mask(var,masks,index.var_num)
+            else:   # a constraint with its own propagator
+                new_mask = index.to_mask(var,const.revise(var,self.domains))
+            if new_mask != masks[num]:
+                new_domain = index.to_set(var,new_mask)
+                removed_vars = index.to_set(var,masks[num] & ~new_mask)
+                self.display(4,"Arc: (",var,",",const,") is inconsistent")
+                self.display(3,"Domain pruned","dom(",var,") =",new_domain," due to ",const, varName=removed_vars)
+                if not new_mask:
+                    self.weights[const] = self.weights.get(const,1)+1
+                if self.trail is not None:
+                    self.trail.append((num,masks[num]))
+                masks[num] = new_mask
+                add_to_do = self.new_to_do(var,const)
+                to_do |= add_to_do      # set union
+                self.display(3,"  adding",add_to_do if add_to_do else "nothing", "to to_do.")
+            self.display(4,"Arc: (",var,",",const,") now consistent")
+        self.display(2,"AC done. Reduced domains",self.domains)
+        if self.cache is not None:
+            self.save_fixpoint(key)
 
 from searchProblem import Search_problem
 
 class Search_with_AC_from_CSP(Search_problem,Displayable):
     """A search problem with arc consistency and domain splitting
 
-    A node is a CSP """
-    def __init__(self, csp):
-        self.cons = Con_solver(csp)  #copy of the CSP
+    A node is a CSP
+
+    If trail is True, there is only one node, whose domains are changed in
+    place; neighbor_nodes undoes its changes before trying the next split.
+    A node is then only valid until the search continues, and it is
+    identified by the fingerprint of its domains (see node_key).
+    """
+    def __init__(self, csp, engine="ac3", trail=False, var_order="first",
+                 split="half"):
+        self.cons = Con_solver(csp, engine=engine, var_order=var_order,
+                               split=split)  #copy of the CSP
+        if trail:
+            self.cons.trail = []
         self.cons.make_arc_consistent() # this has side effects
 
     def is_goal(self, node):
@@ -125,18 +795,26 @@ class Search_with_AC_from_CSP(Search_problem,Displayable):
     
     def start_nodes(self):
         return [self.cons]
+
+    def node_key(self,node):
+        """with a trail, every node is the same solver, so a node is
+        identified by its current domains"""
+        if node.trail is not None:
+            return node.fingerprint()
+        return node
     
     def neighbor_nodes(self,node):
         """an iterator over the neighboring nodes of node.
         This is used for depth-first search"""
-        var = select(x for x in node.domains if len(node.domains[x])>1)
+        var = node.select_var(x for x in node.domains if len(node.domains[x])>1)
         if var:
-            split = len(node.domains[var])//2
-            dom1 = set(list(node.domains[var])[:split]) #a nonempty proper subset
-            dom2 = node.domains[var]-dom1
-            self.display(2,"Splitting", var, "into", dom1, "and", dom2)
+            doms = node.split_domain(var)
+            self.display(2,"Splitting", var, "into", " and ".join(str(dom) for dom in doms))
             to_do = node.new_to_do(var,None)
-            for dom in [dom1,dom2]:
+            if node.trail is not None:
+                yield from self.neighbor_nodes_trail(node,var,doms,to_do)
+                return
+            for dom in doms:
                 newcsp = node.copy_with_assign(var,dom)
                 newcsp.make_arc_consistent(to_do)
                 if all(len(newcsp.domains[v])>0 for v in newcsp.domains):
@@ -145,6 +823,20 @@ class Search_with_AC_from_CSP(Search_problem,Displayable):
                 else:
                     self.display(2,"...",var,"in",dom,"has no solution")
 
+    def neighbor_nodes_trail(self,node,var,doms,to_do):
+        """generates node with var restricted to each domain in doms in turn,
+        changing the domains of node in place and undoing the changes after
+        the search of each neighbor is finished."""
+        checkpoint = len(node.trail)
+        for dom in doms:
+            node.set_domain(var,dom)
+            node.make_arc_consistent(to_do)
+            if all(len(node.domains[v])>0 for v in node.domains):
+                yield node
+            else:
+                self.display(2,"...",var,"in",dom,"has no solution")
+            node.undo(checkpoint)
+
 def select(iterable):
     """select an element of iterable. Returns None if there is no such element.
     
@@ -155,11 +847,159 @@ def select(iterable):
     for e in iterable:
         return e    #returns first element found
 
-from cspExamples import csp1, csp2, crossword1, crossword2, crossword2d
+def select_mrv(solver,variables):
+    """minimum remaining values: a variable with the smallest domain"""
+    return min(variables, key=lambda var: len(solver.domains[var]))
+
+def live_constraints(solver,var):
+    """generates the constraints on var that have another variable
+    with more than one value"""
+    for const in solver.csp.var_to_const[var]:
+        if any(ov != var and len(solver.domains[ov])>1 for ov in const.scope):
+            yield const
+
+def select_degree(solver,variables):
+    """a variable in the most constraints with other unassigned variables"""
+    return max(variables,
+               key=lambda var: sum(1 for const in live_constraints(solver,var)))
+
+def select_dom_wdeg(solver,variables):
+    """a variable with the smallest ratio of domain size to weighted degree,
+    where the weight of a constraint is one more than the number of
+    domain wipeouts it has caused"""
+    def dom_wdeg(var):
+        wdeg = sum(solver.weights.get(const,1)
+                   for const in live_constraints(solver,var))
+        return len(solver.domains[var])/wdeg if wdeg else float('inf')
+    return min(variables, key=dom_wdeg)
+
+if numpy is not None:
+    numpy_comparisons = {lt:numpy.less, le:numpy.less_equal, eq:numpy.equal,
+                         ne:numpy.not_equal, ge:numpy.greater_equal, gt:numpy.greater}
+else:
+    numpy_comparisons = {}
+
+# converse[rel] is the relation such that rel(x,y) == converse[rel](y,x)
+converse = {lt:gt, le:ge, eq:eq, ne:ne, ge:le, gt:lt}
+
+var_orders = {"first": lambda solver,variables: select(variables),
+              "mrv": select_mrv,
+              "degree": select_degree,
+              "dom/wdeg": select_dom_wdeg}
+
+def luby(i):
+    """the ith element (starting from 1) of the Luby sequence
+    1,1,2,1,1,2,4,1,1,2,1,1,2,4,8,... used as the lengths of restarts"""
+    k = 1
+    while (1<<k)-1 < i:
+        k += 1
+    if (1<<k)-1 == i:
+        return 1<<(k-1)
+    return luby(i-(1<<(k-1))+1)
+
+def ordered(domain):
+    """returns the values in domain as a sorted list.
+    Values that cannot be compared are sorted by their string representation.
+    """
+    try:
+        return sorted(domain)
+    except TypeError:
+        return sorted(domain, key=str)
+
+def split_half(solver,var):
+    """splits the domain into two halves in the order the set gives them"""
+    domain = solver.domains[var]
+    if isinstance(domain,Interval_domain):
+        return domain.split()
+    split = len(domain)//2
+    dom1 = set(list(domain)[:split]) #a nonempty proper subset
+    return [dom1, domain-dom1]
+
+def split_bisect(solver,var):
+    """splits the sorted domain into a lower and an upper half"""
+    if isinstance(solver.domains[var],Interval_domain):
+        return solver.domains[var].split()
+    values = ordered(solver.domains[var])
+    split = len(values)//2
+    return [set(values[:split]), set(values[split:])]
+
+def split_enumerate(solver,var):
+    """splits the domain into the smallest value and the rest"""
+    domain = solver.domains[var]
+    if isinstance(domain,Interval_domain):
+        return [domain.clip(hi=domain.lower()), domain.clip(lo=domain.lower()+1)]
+    values = ordered(solver.domains[var])
+    return [{values[0]}, set(values[1:])]
+
+def split_lcv(solver,var):
+    """splits the domain into single values, least constraining value first:
+    the value that leaves the most values in the domains of the neighbouring
+    variables with a support.
+    If var or a neighbouring variable has an Interval_domain, which can be
+    too large to enumerate, the domain is split in half instead."""
+    if any(isinstance(solver.domains[ov],Interval_domain)
+           for const in solver.csp.var_to_const[var] for ov in const.scope):
+        return split_half(solver,var)
+    def supports_kept(val):
+        count = 0
+        for const in solver.csp.var_to_const[var]:
+            for ov in const.scope:
+                if ov != var:
+                    other_vars = [v for v in const.scope if v != var and v != ov]
+                    count += sum(1 for oval in solver.domains[ov]
+                                 if solver.any_holds(const,{var:val,ov:oval},other_vars,0))
+        return count
+    return [{val} for val in sorted(ordered(solver.domains[var]),
+                                    key=supports_kept, reverse=True)]
+
+def split_random(solver,var):
+    """splits the domain into two random halves, tried in a random order"""
+    domain = solver.domains[var]
+    if isinstance(domain,Interval_domain):
+        doms = domain.split()
+    else:
+        values = list(domain)
+        random.shuffle(values)
+        split = len(values)//2
+        doms = [set(values[:split]), set(values[split:])]
+    random.shuffle(doms)
+    return doms
+
+domain_splits = {"half": split_half,
+                 "bisect": split_bisect,
+                 "enumerate": split_enumerate,
+                 "lcv": split_lcv,
+                 "random": split_random}
+
+from cspExamples import csp1, csp2, crossword1, crossword2, crossword2d, crossword2t, queens, schedule
 from searchDepthFirst import Depth_first_search
 
 ## Test Solving CSPs with Arc consistency and domain splitting:
 #Con_solver(csp1).solve_one()
+#Con_solver(crossword2, engine="ac3rm").solve_one()  # reuses residual supports
+#Con_solver(crossword2d, engine="table").solve_one()  # compiles the constraints first
+#Bitset_con_solver(crossword2d).solve_one()  # domains stored as bitsets
+#Con_solver(crossword2d).solve_one_trail()  # undoes changes instead of copying
+#Con_solver(crossword2d, var_order="dom/wdeg").solve_one()
+#Con_solver(crossword2, var_order="mrv", split="lcv").solve_one()
+#for sol in Con_solver(csp1).solve_all(): print(sol)
+#Con_solver(crossword2d).count_solutions()
+#Con_solver(csp2).count_solutions_by_components()
+#Con_solver(crossword2t).solve_one()  # is_word as table constraints
+#Con_solver(queens(8)).count_solutions()  # uses an All_different constraint
+#Con_solver(csp2, engine="vector").solve_one()  # needs NumPy
+#Con_solver(schedule).solve_one()  # Interval_domains, revised by their bounds
+#cs1 = Con_solver(csp1); cs1.make_arc_consistent()
+#cs1.add_constraint(Constraint(('A','C'),ne)); cs1.domains  # only propagates from the new arcs
+#cs1.tighten_domain('B',{2,3}); cs1.domains
+#cs2d = Con_solver(crossword2d, cache=1000); cs2d.count_solutions(); cs2d.count_solutions()
+#cs2d.cache.hit_rate()  # the second count only uses cached fixpoints
+#Con_solver(queens(30)).solve_within(Budget(max_nodes=1000, max_time=5))
+#Con_solver(queens(30), var_order="dom/wdeg").solve_with_restarts(Budget(max_time=10))
+#memos = [const.memoize() for const in crossword2d.constraints]
+#Con_solver(crossword2d).count_solutions(); [memo.hit_rate() for memo in memos]
+#searcher2t = Depth_first_search(Search_with_AC_from_CSP(crossword2, trail=True))
+#print(searcher2t.search().domains)
 #searcher1d = Depth_first_search(Search_with_AC_from_CSP(csp1))
 #print(searcher1d.search().domains)
 #Depth_first_search.max_display_level = 2  # display search trace (0 turns off)
@@ -8,7 +8,7 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
-from cspProblem import CSP, Constraint        
+from cspProblem import CSP, Constraint, Table_constraint, All_different, Interval_domain
 from operator import lt,ne,eq,gt
 
 def ne_(val):
@@ -121,4 +121,45 @@ crossword2d = CSP({"p00":letters, "p01":letters, "p02":letters,
                    Constraint(("p00","p10","p20"), is_word),
                    Constraint(("p01","p11","p21"), is_word),
                    Constraint(("p02","p12","p22"), is_word)])
-                   
+
+def word_table(scope, words):
+    """a constraint that the letters of the variables in scope spell one of words"""
+    return Table_constraint(scope, [tuple(word) for word in words
+                                    if len(word) == len(scope)], "is_word")
+
+# crossword2d with the words as table constraints
+crossword2t = CSP({"p00":letters, "p01":letters, "p02":letters,
+                  "p10":letters, "p11":letters, "p12":letters,
+                  "p20":letters, "p21":letters, "p22":letters},
+                  [word_table(("p00","p01","p02"), words1),
+                   word_table(("p10","p11","p12"), words1),
+                   word_table(("p20","p21","p22"), words1),
+                   word_table(("p00","p10","p20"), words1),
+                   word_table(("p01","p11","p21"), words1),
+                   word_table(("p02","p12","p22"), words1)])
+
+def not_diagonal(rows):
+    """queens that are rows apart are not on a diagonal"""
+    def nd(col1,col2):
+        return abs(col1-col2) != rows
+    nd.__name__ = "not_diagonal("+str(rows)+")"
+    return nd
+
+def queens(n):
+    """the n-queens problem: variable Qi is the column of the queen in row i.
+    The columns are given by one All_different constraint."""
+    rows = ['Q'+str(i) for i in range(n)]
+    return CSP({row:set(range(n)) for row in rows},
+               [All_different(tuple(rows))]+
+               [Constraint((rows[i],rows[j]),not_diagonal(j-i))
+                for i in range(n) for j in range(i+1,n)])
+
+# a schedule over a horizon of a million time steps; the times are Interval_domains
+horizon = Interval_domain(0,1000000)
+schedule = CSP({'design':horizon, 'build':horizon, 'test':horizon,
+                'review':{250000,750000}, 'release':Interval_domain(999990,1000000)},
+               [Constraint(('design','build'),lt),
+                Constraint(('build','test'),lt),
+                Constraint(('test','release'),lt),
+                Constraint(('review','build'),lt),
+                Constraint(('design','review'),ne)])
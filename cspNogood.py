@@ -0,0 +1,179 @@
+# cspNogood.py - Domain splitting with nogood learning and conflict-directed backjumping
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+from cspConsistency import Con_solver, select
+from utilities import Budget_exhausted
+
+class Nogood_con_solver(Con_solver):
+    """A Con_solver that learns from failures.
+
+    A decision is the restriction of the domain of a variable to one of the
+    parts given by split_domain; decisions are numbered by their depth.
+    explanations[var] is the set of decisions that explain why the domain of
+    var is smaller than after the initial arc consistency: when a constraint
+    prunes var, the explanations of the other variables in its scope are
+    added. When a domain is wiped out, its explanation is a conflict set.
+
+    If the conflict set of a subtree does not contain the decision that made
+    the subtree, the other parts of that split cannot lead to a solution
+    either, so the search backjumps over them.
+    When all of the parts of a split fail, the decisions in the conflict set
+    are recorded as a nogood: an inconsistent list of (var,domain) pairs. A
+    node is pruned when all of the domains are within those of a nogood.
+    At most max_nogoods are kept; the least recently used is discarded.
+    Nogoods and explanations only stay valid while the CSP gets tighter, so
+    they are forgotten when a constraint is retracted or a domain is reset.
+    """
+    def __init__(self, csp, domains=None, engine="ac3", var_order="first",
+                 split="half", max_nogoods=1000):
+        super().__init__(csp, domains, engine=engine, var_order=var_order,
+                         split=split)
+        self.max_nogoods = max_nogoods
+        self.nogoods = []   # least recently used first
+        self.explanations = {var:frozenset() for var in self.domains}
+        self.decisions = []   # (var,domain) for each depth
+        self.reason = None    # the constraint being revised
+        self.trail = []
+        self.stats.update(nodes=0, backjumps=0, nogoods=0, nogood_prunes=0)
+
+    def revise(self,var,const):
+        """returns the values in the domain of var that have a support in const,
+        remembering const as the reason for a change"""
+        self.reason = const
+        return super().revise(var,const)
+
+    def make_arc_consistent(self,to_do=None):
+        """Makes this CSP arc-consistent using generalized arc consistency
+        to_do is a set of (variable,constraint) pairs
+        """
+        super().make_arc_consistent(to_do)
+        self.reason = None
+
+    def set_domain(self,var,new_domain):
+        """sets the domain of var to new_domain, adding the explanations of
+        the other variables of the constraint being revised (if any) to
+        the explanation of var. The trail records the old domain and explanation.
+        """
+        self.trail.append((var,self.domains[var],self.explanations[var]))
+        if self.reason is not None:
+            self.explanations[var] = self.explanations[var].union(
+                *(self.explanations[ov] for ov in self.reason.scope if ov != var))
+        self.domains[var] = new_domain
+
+    def undo(self,checkpoint):
+        """undoes the changes to the domains back to checkpoint, a length of the trail"""
+        while len(self.trail) > checkpoint:
+            var,old_domain,old_explanation = self.trail.pop()
+            self.domains[var] = old_domain
+            self.explanations[var] = old_explanation
+
+    def retract_constraint(self,const):
+        """removes const from the CSP and recomputes arc consistency,
+        forgetting what has been learned (see forget).
+        Returns False if a domain is still empty and True otherwise.
+        """
+        self.forget()
+        return super().retract_constraint(const)
+
+    def reset_domain(self,var,domain):
+        """sets the domain of var before propagation to domain and recomputes
+        arc consistency, forgetting what has been learned (see forget).
+        Returns False if a domain has become empty and True otherwise.
+        """
+        self.forget()
+        return super().reset_domain(var,domain)
+
+    def forget(self):
+        """discards the nogoods and explanations, which may not hold once
+        the CSP has been relaxed"""
+        self.display(2,"Forgetting",len(self.nogoods),"nogoods")
+        self.nogoods = []
+        self.explanations = {var:frozenset() for var in self.domains}
+
+    def solve_one(self,to_do=None):
+        """return a solution to the current CSP or False if there are no solutions
+        to_do is the list of arcs to check
+        """
+        checkpoint = len(self.trail)
+        try:
+            solution,conflict = self.search(to_do)
+        except Budget_exhausted:
+            self.undo(checkpoint)
+            self.decisions = []
+            raise
+        return solution or False
+
+    def search(self,to_do):
+        """searches below the current decisions.
+        Returns (solution,None) or (None,conflict) where conflict is a set of
+        depths of decisions that together have no solution.
+        """
+        self.stats["nodes"] += 1
+        self.spend()
+        self.make_arc_consistent(to_do)
+        empty = [var for var in self.domains if len(self.domains[var])==0]
+        if empty:
+            return None, min((self.explanations[var] for var in empty), key=len)
+        conflict = self.nogood_conflict()
+        if conflict is not None:
+            return None, conflict
+        if all(len(self.domains[var])==1 for var in self.domains):
+            self.display(2,"solution:", {var:select(self.domains[var]) for var in self.domains})
+            return {var:select(self.domains[var]) for var in self.domains}, None
+        var = self.select_var(x for x in self.csp.variables if len(self.domains[x])>1)
+        doms = self.split_domain(var)
+        self.display(3,"...splitting",var,"into"," and ".join(str(dom) for dom in doms))
+        depth = len(self.decisions)
+        conflict = set(self.explanations[var])   # why the parts are all there is
+        to_do = self.new_to_do(var,None)
+        for dom in doms:
+            checkpoint = len(self.trail)
+            self.decisions.append((var,dom))
+            self.set_domain(var,dom)
+            self.explanations[var] = self.explanations[var] | {depth}
+            solution,child_conflict = self.search(to_do)
+            self.decisions.pop()
+            self.undo(checkpoint)
+            if solution:
+                return solution, None
+            if depth not in child_conflict:
+                self.display(2,"Backjumping over",var,"past the decisions",child_conflict)
+                self.stats["backjumps"] += 1
+                return None, child_conflict
+            conflict |= child_conflict - {depth}
+        self.learn(conflict)
+        return None, conflict
+
+    def learn(self,conflict):
+        """records the decisions at the depths in conflict as a nogood"""
+        nogood = tuple(self.decisions[depth] for depth in sorted(conflict))
+        self.display(3,"Learned nogood",nogood)
+        self.nogoods.append(nogood)
+        self.stats["nogoods"] += 1
+        if len(self.nogoods) > self.max_nogoods:
+            self.nogoods.pop(0)
+
+    def nogood_conflict(self):
+        """returns a conflict set if the current domains are within a nogood,
+        and None otherwise"""
+        for i,nogood in enumerate(self.nogoods):
+            if all(self.domains[var] <= dom for (var,dom) in nogood):
+                self.display(2,"Pruned by nogood",nogood)
+                self.stats["nogood_prunes"] += 1
+                self.nogoods.append(self.nogoods.pop(i))
+                return set().union(*(self.explanations[var] for (var,dom) in nogood))
+        return None
+
+from cspExamples import csp1, crossword2d, queens
+
+## Test solving with nogood learning and backjumping:
+#Nogood_con_solver(csp1).solve_one()
+#Nogood_con_solver(queens(10), var_order="mrv").solve_one()
+#ns = Nogood_con_solver(crossword2d); ns.solve_one(); ns.stats
@@ -0,0 +1,260 @@
+# cspParallel.py - Domain splitting for a CSP on a pool of processes
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from cspConsistency import Bitset_con_solver
+from utilities import Displayable
+
+class Parallel_con_solver(Displayable):
+    """Solves a CSP by arc consistency and domain splitting, where the
+    subtrees of the search are solved by a pool of worker processes.
+
+    A subproblem is sent between processes as a pair (masks,var), where masks
+    is the tuple of bitsets of the domains (see Bitset_domains) and var is
+    the variable that was split to create it (None if it has not been made
+    arc consistent yet).
+    Each task searches at most node_limit nodes; a worker that has not
+    finished its subtree by then returns the unexplored subproblems, which are
+    shared out again among the workers. This lets idle workers take over
+    parts of a large subtree.
+    """
+    def __init__(self, csp, workers=None, tasks_per_worker=4, node_limit=1000,
+                 var_order="first", split="half"):
+        self.csp = csp
+        self.workers = workers or multiprocessing.cpu_count()
+        self.tasks_per_worker = tasks_per_worker
+        self.node_limit = node_limit
+        self.var_order = var_order
+        self.split = split
+
+    def solve_one(self):
+        """returns a solution or False if there are no solutions.
+        The remaining work is cancelled as soon as any worker finds a solution.
+        """
+        for solution in self.search("one"):
+            return solution
+        return False
+
+    def solve_all(self):
+        """generates all of the solutions, as the workers find them"""
+        yield from self.search("all")
+
+    def count_solutions(self):
+        """returns the number of solutions"""
+        return sum(self.search("count"))
+
+    def solve_by_components(self):
+        """returns a solution or False if there are no solutions.
+        Each connected component of the constraint graph is solved by a worker.
+        """
+        solution = {}
+        for component_solution in self.map_components("one"):
+            if not component_solution:
+                return False
+            solution.update(component_solution)
+        return solution
+
+    def count_solutions_by_components(self):
+        """returns the number of solutions: the product of the numbers of
+        solutions of the connected components, each counted by a worker.
+        """
+        count = 1
+        for component_count in self.map_components("count"):
+            count *= component_count
+        return count
+
+    def map_components(self, mode):
+        """generates the result of solving each connected component of the
+        constraint graph for mode ("one" or "count") in a worker"""
+        components = [self.csp.sub_csp(component)
+                      for component in self.csp.components()]
+        with ProcessPoolExecutor(min(self.workers,len(components) or 1),
+                                 mp_context=pool_context(),
+                                 initializer=start_component_worker,
+                                 initargs=(components, self.var_order, self.split)
+                                 ) as executor:
+            yield from executor.map(solve_component, range(len(components)),
+                                    [mode]*len(components))
+
+    def search(self, mode):
+        """generates the results of the tasks for mode, which is one of
+        "one": a solution; only the first solution is generated
+        "all": each solution
+        "count": a number of solutions of each task
+        """
+        solver = Worker_solver(self.csp, var_order=self.var_order, split=self.split)
+        index = solver.domains.index
+        tasks = initial_tasks(solver, self.workers*self.tasks_per_worker)
+        self.display(2,"Parallel search of",len(tasks),"subproblems on",
+                     self.workers,"workers")
+        context = pool_context()
+        stop = context.Event()
+        executor = ProcessPoolExecutor(self.workers, mp_context=context,
+                                       initializer=start_worker,
+                                       initargs=(self.csp, stop, self.var_order, self.split))
+        try:
+            running = {executor.submit(search_subproblems, [task], mode,
+                                       self.node_limit)
+                       for task in tasks}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results, unexplored = future.result()
+                    for result in results:
+                        if mode == "count":
+                            yield result
+                        else:
+                            yield {var:select_value(index,var,mask)
+                                   for (var,mask) in zip(index.variables,result)}
+                            if mode == "one":
+                                return
+                    if unexplored:
+                        self.display(3,"Sharing",len(unexplored),"unexplored subproblems")
+                        for chunk in share(unexplored, self.workers):
+                            running.add(executor.submit(search_subproblems, chunk,
+                                                        mode, self.node_limit))
+        finally:   # also when the caller stops asking for results
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def pool_context():
+    """returns the multiprocessing context for the worker processes.
+    Fork is used where possible, so that the workers inherit the CSP instead
+    of it being pickled (constraint conditions are often closures)."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    else:
+        return multiprocessing.get_context()
+
+def select_value(index,var,mask):
+    """returns the value of var represented by the single bit set in mask"""
+    return index.values[index.var_num[var]][mask.bit_length()-1]
+
+def share(subproblems, n):
+    """splits the list subproblems into at most n non-empty lists"""
+    return [subproblems[i::n] for i in range(min(n,len(subproblems)))]
+
+def initial_tasks(solver, num_tasks):
+    """makes solver arc consistent and splits it breadth-first until there are
+    at least num_tasks subproblems (or no subproblem can be split).
+    Returns a list of (masks,var) pairs.
+    """
+    solver.make_arc_consistent()
+    if not all(solver.domains.masks):
+        return []
+    tasks = [(tuple(solver.domains.masks),None)]
+    while len(tasks) < num_tasks:
+        splittable = False
+        new_tasks = []
+        for (masks,var) in tasks:
+            solver.domains.masks = list(masks)
+            if var is not None:
+                solver.make_arc_consistent(solver.new_to_do(var,None))
+                if not all(solver.domains.masks):
+                    continue
+            var = solver.select_var(x for x in solver.csp.variables
+                                      if len(solver.domains[x])>1)
+            if var is None:
+                new_tasks.append((tuple(solver.domains.masks),None))
+            else:
+                splittable = True
+                new_tasks.extend(split_subproblem(solver,var))
+        tasks = new_tasks
+        if not splittable:
+            break
+    return tasks
+
+def split_subproblem(solver, var):
+    """returns the subproblems of the current domains of solver given by
+    splitting the domain of var, in the order they should be tried"""
+    num = solver.domains.index.var_num[var]
+    masks = list(solver.domains.masks)
+    subproblems = []
+    for dom in solver.split_domain(var):
+        masks[num] = solver.domains.index.to_mask(var,dom)
+        subproblems.append((tuple(masks),var))
+    return subproblems
+
+class Worker_solver(Bitset_con_solver):
+    """A Bitset_con_solver used by the parallel workers.
+    There is no notebook to display into, so display does nothing.
+    """
+    def display(self,level,*args,**kwargs):
+        pass
+
+worker_state = {}   # the state of a worker process, set by start_worker
+
+def start_worker(csp, stop, var_order, split):
+    """initializes a worker process"""
+    worker_state["solver"] = Worker_solver(csp, var_order=var_order, split=split)
+    worker_state["stop"] = stop
+
+def start_component_worker(components, var_order, split):
+    """initializes a worker process for solving components"""
+    worker_state["components"] = components
+    worker_state["var_order"] = var_order
+    worker_state["split"] = split
+
+def solve_component(num, mode):
+    """returns a solution (mode "one") or the number of solutions (mode "count")
+    of component number num"""
+    solver = Worker_solver(worker_state["components"][num],
+                           var_order=worker_state["var_order"],
+                           split=worker_state["split"])
+    if mode == "count":
+        return solver.count_solutions()
+    else:
+        return solver.solve_one_trail()
+
+def search_subproblems(subproblems, mode, node_limit):
+    """searches the list of (masks,var) subproblems depth-first.
+    Returns (results,unexplored) where results is the list of the
+    solutions found (as tuples of masks), or of the number of solutions
+    for mode "count", and unexplored is the list of subproblems not
+    searched because node_limit nodes were searched or the search was stopped.
+    """
+    solver = worker_state["solver"]
+    stop = worker_state["stop"]
+    stack = list(reversed(subproblems))
+    results = []
+    count = 0
+    nodes = 0
+    while stack and nodes < node_limit and not stop.is_set():
+        masks,var = stack.pop()
+        nodes += 1
+        solver.domains.masks = list(masks)
+        solver.make_arc_consistent(None if var is None else solver.new_to_do(var,None))
+        current = solver.domains.masks
+        if not all(current):
+            continue
+        var = solver.select_var(x for x in solver.csp.variables
+                                  if len(solver.domains[x])>1)
+        if var is None:   # all domains have one value
+            if mode == "count":
+                count += 1
+            else:
+                results.append(tuple(current))
+                if mode == "one":
+                    return results, []
+        else:
+            stack.extend(reversed(split_subproblem(solver,var)))
+    if mode == "count":
+        results.append(count)
+    return results, list(reversed(stack))
+
+from cspExamples import csp1, crossword2, crossword2d
+
+## Test solving CSPs in parallel (this needs to be run as a script or a
+## notebook on a system that can fork processes):
+#Parallel_con_solver(crossword2d).solve_one()
+#Parallel_con_solver(crossword2, workers=4).count_solutions()
+#for sol in Parallel_con_solver(csp1).solve_all(): print(sol)
+#Parallel_con_solver(crossword2).count_solutions_by_components()
@@ -9,6 +9,13 @@
 # See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
 from utilities import Displayable, dict_union
+from itertools import product
+from collections.abc import MutableMapping
+from collections import OrderedDict
+import copy
+import bisect
+import functools
+import threading
 
 class Constraint(object):
     """A Constraint consists of
@@ -19,6 +26,7 @@ class Constraint(object):
     def __init__(self, scope, condition):
         self.scope = scope
         self.condition = condition
+        self.table = None   # Support_table once compiled
 
     # __repr__: if the scope contains 2 variables, return infix representation:
     #   var1 constraint var2
@@ -43,6 +51,539 @@ class Constraint(object):
         """
         return self.condition(*tuple(assignment[v] for v in self.scope))
 
+    def compile(self,domains,index=None):
+        """compiles the constraint into an extensional table for domains,
+        a dictionary that maps each variable in the scope into a finite set.
+        If index (a Domain_index) is given, values are numbered as in index.
+        """
+        self.table = Support_table(self,domains,index)
+        return self.table
+
+    def allowed_tuples(self,domains):
+        """generates the tuples of values from domains for which the constraint holds"""
+        for vals in product(*(domains[var] for var in self.scope)):
+            if self.condition(*vals):
+                yield vals
+
+    def revise(self,var,domains):
+        """returns the values in domains[var] that have a support given domains,
+        or None if the solver has to search for the supports itself.
+        Constraints with a specialized propagator override this.
+        """
+        return None
+
+    def memoize(self,maxsize=10000):
+        """makes the condition remember its value for the maxsize most
+        recently checked tuples of values, and returns the Memo_condition.
+        This is for conditions that are expensive to evaluate. The solvers
+        no longer recognize a memoized comparison such as lt, so they then
+        do not use bounds or vectorized revisions for it.
+        """
+        if not isinstance(self.condition,Memo_condition):
+            self.condition = Memo_condition(self.condition,maxsize)
+        return self.condition
+
+class Memo_condition(object):
+    """A condition that remembers its value for the maxsize most recently
+    used tuples of arguments, which must be hashable.
+    hits and misses count the calls that did and did not use a remembered value.
+    It can be shared by solver copies and threads; the condition itself is
+    evaluated outside the lock, so it may be evaluated more than once for
+    the same arguments by different threads.
+    """
+    def __init__(self, condition, maxsize=10000):
+        functools.update_wrapper(self,condition)   # keeps __name__ and __doc__
+        self.condition = condition
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __call__(self,*args):
+        with self.lock:
+            if args in self.values:
+                self.hits += 1
+                self.values.move_to_end(args)
+                return self.values[args]
+            self.misses += 1
+        value = self.condition(*args)
+        with self.lock:
+            self.values[args] = value
+            if len(self.values) > self.maxsize:
+                self.values.popitem(last=False)
+        return value
+
+    def clear(self):
+        """forgets the remembered values"""
+        with self.lock:
+            self.values.clear()
+
+    def hit_rate(self):
+        """the proportion of the calls that used a remembered value"""
+        calls = self.hits+self.misses
+        return self.hits/calls if calls else 0
+
+class Global_constraint(Constraint):
+    """A constraint with its own propagator, which finds the supported values
+    of all of the variables in the scope at once.
+    Subclasses define supported_values(doms).
+    """
+    def __init__(self, scope, condition):
+        super().__init__(scope, condition)
+        self.last_revision = None  # (domains,supported values) of the last propagation
+
+    def revise(self,var,domains):
+        """returns the values in domains[var] that have a support given domains.
+        The supported values of the whole scope are remembered for the domains,
+        so the other arcs of this constraint can reuse them.
+        """
+        doms = tuple(domains[v] for v in self.scope)
+        last = self.last_revision
+        if last is None or any(dom is not last_dom and dom != last_dom
+                               for (dom,last_dom) in zip(doms,last[0])):
+            last = (doms, self.supported_values(doms))
+            self.last_revision = last
+        return set(last[1][self.scope.index(var)])
+
+    def supported_values(self,doms):
+        """returns a list with the set of supported values of each variable in the
+        scope, where doms is the tuple of the domains of the scope"""
+        raise NotImplementedError("supported_values")   # abstract method
+
+class Table_constraint(Global_constraint):
+    """A constraint given by the list of the tuples of values it allows.
+    The tuples are indexed in a trie: a nested dictionary with a level for
+    each variable in the scope. Generalized arc consistency walks only the
+    branches whose values are in the domains, and finds the supported values
+    of all of the variables in one pass.
+    """
+    def __init__(self, scope, tuples, name="in_table"):
+        self.tuples = {tuple(vals) for vals in tuples}
+        def in_table(*vals):
+            return vals in self.tuples
+        in_table.__name__ = name
+        super().__init__(scope, in_table)
+        self.trie = {}
+        for vals in self.tuples:
+            node = self.trie
+            for val in vals:
+                node = node.setdefault(val,{})
+
+    def allowed_tuples(self,domains):
+        """generates the tuples of values from domains for which the constraint holds"""
+        for vals in self.tuples:
+            if all(val in domains[var] for (var,val) in zip(self.scope,vals)):
+                yield vals
+
+    def supported_values(self,doms):
+        """returns a list with the set of supported values of each variable in the
+        scope, where doms is the tuple of the domains of the scope"""
+        supported = [set() for var in self.scope]
+        def walk(node,depth):
+            """adds the values on the live branches below node; returns True
+            if there is a live branch"""
+            if depth == len(doms):
+                return True
+            live = False
+            dom = doms[depth]
+            for (val,child) in node.items():
+                if val in dom and walk(child,depth+1):
+                    supported[depth].add(val)
+                    live = True
+            return live
+        walk(self.trie,0)
+        return supported
+
+def all_different(*vals):
+    """is true if no two of the values are equal"""
+    return len(set(vals)) == len(vals)
+
+class All_different(Global_constraint):
+    """A constraint that the variables in the scope all have different values.
+    Generalized arc consistency uses Regin's algorithm: a value is supported
+    if the edge between the variable and the value is in some maximum
+    matching of the variables to the values.
+    """
+    def __init__(self, scope):
+        super().__init__(scope, all_different)
+        self.matching = {}   # var -> value of the last maximum matching
+
+    def compile(self,domains,index=None):
+        """an extensional table would be exponential in the size of the scope,
+        so All_different is not compiled; it uses its own propagator."""
+        self.table = None
+        return None
+
+    def supported_values(self,doms):
+        """returns a list with the set of supported values of each variable in the
+        scope, where doms is the tuple of the domains of the scope"""
+        n = len(doms)
+        # start from the previous matching, where it is still possible
+        matching = {}   # variable position -> value
+        matched = {}    # value -> variable position
+        for i in range(n):
+            val = self.matching.get(self.scope[i])
+            if val in doms[i] and val not in matched:
+                matching[i] = val
+                matched[val] = i
+        for i in range(n):
+            if i not in matching and not augment(i,doms,matching,matched,set()):
+                return [set() for dom in doms]   # no matching covers the variables
+        self.matching = {self.scope[i]:val for (i,val) in matching.items()}
+        # graph with an arc from a value to each variable that can take it
+        # (other than its matched variable), and from a variable to its value
+        graph = {('val',val):[] for dom in doms for val in dom}
+        for i in range(n):
+            graph[('var',i)] = [('val',matching[i])]
+            for val in doms[i]:
+                if val != matching[i]:
+                    graph[('val',val)].append(('var',i))
+        # values on an alternating path from a free value
+        reached = {('val',val) for dom in doms for val in dom if val not in matched}
+        to_visit = list(reached)
+        while to_visit:
+            for nxt in graph[to_visit.pop()]:
+                if nxt not in reached:
+                    reached.add(nxt)
+                    to_visit.append(nxt)
+        component = strongly_connected_components(graph)
+        return [{val for val in doms[i]
+                 if val == matching[i] or ('val',val) in reached
+                    or component[('val',val)] == component[('var',i)]}
+                for i in range(n)]
+
+def augment(i,doms,matching,matched,visited):
+    """tries to find an augmenting path from the variable in position i.
+    If there is one, matching and matched are updated and True is returned.
+    The path is searched depth-first with an explicit stack of (variable
+    position, iterator over its values), so long paths do not recurse.
+    """
+    stack = [(i,iter(doms[i]))]
+    path = []   # path[k] is the value chosen for the variable of stack[k]
+    while stack:
+        j,vals = stack[-1]
+        for val in vals:
+            if val not in visited:
+                visited.add(val)
+                break
+        else:   # no augmenting path through the variable in position j
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+        path.append(val)
+        if val not in matched:
+            for (j,_),val in zip(stack,path):
+                matching[j] = val
+                matched[val] = j
+            return True
+        stack.append((matched[val],iter(doms[matched[val]])))
+    return False
+
+def strongly_connected_components(graph):
+    """returns a dictionary that maps each node of graph into the number of its
+    strongly connected component (Tarjan's algorithm).
+    graph maps each node into the list of nodes it has an arc to.
+    The depth-first search uses an explicit stack of (node, iterator over
+    its arcs), so large graphs do not recurse.
+    """
+    component = {}
+    number = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    def discover(node):
+        number[node] = lowlink[node] = len(number)
+        stack.append(node)
+        on_stack.add(node)
+        return (node,iter(graph[node]))
+    for root in graph:
+        if root in number:
+            continue
+        to_visit = [discover(root)]
+        while to_visit:
+            node,arcs = to_visit[-1]
+            for nxt in arcs:
+                if nxt not in number:
+                    to_visit.append(discover(nxt))
+                    break
+                elif nxt in on_stack:
+                    lowlink[node] = min(lowlink[node],number[nxt])
+            else:   # all of the arcs of node have been followed
+                to_visit.pop()
+                if to_visit:
+                    parent = to_visit[-1][0]
+                    lowlink[parent] = min(lowlink[parent],lowlink[node])
+                if lowlink[node] == number[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component[member] = number[node]
+                        if member == node:
+                            break
+    return component
+
+class Support_table(object):
+    """An extensional representation of a constraint over finite domains.
+    Sets of values are represented as bitsets (ints).
+
+    For a binary constraint, supports[var][val] is the bitset of the values of
+    the other variable that are consistent with var=val.
+    Otherwise the allowed tuples are numbered and supports[var][val] is the
+    bitset of the allowed tuples with var=val.
+    If compiled with a Domain_index, the values are numbered by the index and
+    revise_mask can revise domains stored as bitsets.
+    """
+    def __init__(self, const, domains, index=None):
+        self.scope = const.scope
+        self.domains = {var:set(domains[var]) for var in self.scope}
+        self.index = index
+        self.binary = len(self.scope) == 2 and self.scope[0] != self.scope[1]
+        if index is None:
+            self.bit = {var:{val:1<<i for (i,val) in enumerate(self.domains[var])}
+                        for var in self.scope}
+        else:
+            self.bit = {var:index.val_bit[index.var_num[var]] for var in self.scope}
+        self.supports = {var:{val:0 for val in self.domains[var]}
+                         for var in self.scope}
+        self.num_tuples = 0
+        for vals in const.allowed_tuples(self.domains):
+            if self.binary:
+                (x,y),(xval,yval) = self.scope,vals
+                self.supports[x][xval] |= self.bit[y][yval]
+                self.supports[y][yval] |= self.bit[x][xval]
+            else:
+                for (var,val) in zip(self.scope,vals):
+                    self.supports[var][val] |= 1<<self.num_tuples
+            self.num_tuples += 1
+        if index is not None:
+            # supports indexed by the position of the value's bit
+            self.supports_at = {var:[self.supports[var].get(val,0)
+                                     for val in index.values[index.var_num[var]]]
+                                for var in self.scope}
+
+    def covers(self,domains):
+        """is True if the table was compiled for domains that include domains"""
+        return all(domains[var] <= self.domains[var] for var in self.scope)
+
+    def revise(self,var,domains):
+        """returns the values in domains[var] that have a support given domains.
+        This is a bitwise AND per value instead of a search for a support.
+        """
+        if self.binary:
+            other = self.scope[1] if var == self.scope[0] else self.scope[0]
+            bit = self.bit[other]
+            live = 0
+            for val in domains[other]:
+                live |= bit[val]
+        else:
+            live = -1   # all tuples
+            for ov in self.scope:
+                if ov != var:
+                    sup = self.supports[ov]
+                    ovmask = 0
+                    for val in domains[ov]:
+                        ovmask |= sup[val]
+                    live &= ovmask
+        sup = self.supports[var]
+        return {val for val in domains[var] if sup[val] & live}
+
+    def revise_mask(self,var,masks,var_num):
+        """returns the bitset of the values of var that have a support,
+        where masks[var_num[v]] is the bitset of the domain of variable v.
+        This requires the table to be compiled with a Domain_index.
+        """
+        if self.binary:
+            other = self.scope[1] if var == self.scope[0] else self.scope[0]
+            live = masks[var_num[other]]
+        else:
+            live = -1   # all tuples
+            for ov in self.scope:
+                if ov != var:
+                    sup = self.supports_at[ov]
+                    ovmask = 0
+                    for i in bit_positions(masks[var_num[ov]]):
+                        ovmask |= sup[i]
+                    live &= ovmask
+        sup = self.supports_at[var]
+        new_mask = 0
+        for i in bit_positions(masks[var_num[var]]):
+            if sup[i] & live:
+                new_mask |= 1<<i
+        return new_mask
+
+def bit_positions(mask):
+    """generates the positions of the bits that are set in mask"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length()-1
+        mask ^= low
+
+class Domain_index(object):
+    """Numbers the variables of a CSP, and the values in each domain, so
+    that a domain can be stored as a bitset (an int).
+    * variables is the list of variables; var_num maps a variable to its number
+    * values[n] is the list of values of variable number n; value values[n][i]
+      is represented by bit i, and val_bit[n] maps each value to 1<<i
+    """
+    __slots__ = ("variables","var_num","values","val_bit")
+    def __init__(self, domains):
+        self.variables = list(domains)
+        self.var_num = {var:n for (n,var) in enumerate(self.variables)}
+        self.values = [list(domains[var]) for var in self.variables]
+        self.val_bit = [{val:1<<i for (i,val) in enumerate(vals)}
+                        for vals in self.values]
+
+    def to_mask(self,var,domain):
+        """returns the bitset for the set of values domain of var"""
+        bit = self.val_bit[self.var_num[var]]
+        mask = 0
+        for val in domain:
+            mask |= bit[val]
+        return mask
+
+    def to_set(self,var,mask):
+        """returns the set of values of var represented by the bitset mask"""
+        vals = self.values[self.var_num[var]]
+        return {vals[i] for i in bit_positions(mask)}
+
+class Bitset_domains(MutableMapping):
+    """A dictionary that maps each variable into its domain, where the
+    domains are stored as a list of bitsets, masks, numbered by index.
+    Reading a domain gives a set of values, and a set can be assigned to it.
+    """
+    __slots__ = ("index","masks")
+    def __init__(self, index, domains=None, masks=None):
+        self.index = index
+        if masks is not None:
+            self.masks = masks
+        else:
+            self.masks = [index.to_mask(var,domains[var]) for var in index.variables]
+
+    def __getitem__(self,var):
+        return self.index.to_set(var,self.masks[self.index.var_num[var]])
+
+    def __setitem__(self,var,domain):
+        self.masks[self.index.var_num[var]] = self.index.to_mask(var,domain)
+
+    def __delitem__(self,var):
+        raise TypeError("the variables of Bitset_domains cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.index.variables)
+
+    def __len__(self):
+        return len(self.index.variables)
+
+    def copy(self):
+        return Bitset_domains(self.index, masks=list(self.masks))
+
+    def __repr__(self):
+        return str(dict(self.items()))
+
+class Interval_domain(object):
+    """A set of integers stored as a sorted tuple of disjoint intervals (lo,hi),
+    where (lo,hi) contains the integers lo..hi.
+    It can be used as the domain of a variable instead of a set, when the
+    domain is too large to store value by value. It supports the set
+    operations the solvers use; Con_solver propagates bounds on it for
+    comparison constraints, so that it is only enumerated when it is small.
+    """
+    __slots__ = ("intervals","size")
+    def __init__(self, lo=None, hi=None, intervals=None):
+        if intervals is None:
+            intervals = [(lo,hi)]
+        merged = []
+        for (ilo,ihi) in sorted(intervals):
+            if ilo > ihi:
+                continue
+            if merged and ilo <= merged[-1][1]+1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1],ihi))
+            else:
+                merged.append((ilo,ihi))
+        self.intervals = tuple(merged)
+        self.size = sum(ihi-ilo+1 for (ilo,ihi) in merged)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for (lo,hi) in self.intervals:
+            yield from range(lo,hi+1)
+
+    def __contains__(self,val):
+        try:
+            if val != int(val):   # only integers are in an Interval_domain
+                return False
+            i = bisect.bisect_right(self.intervals,(val,float('inf')))-1
+        except (TypeError,ValueError,OverflowError):
+            return False
+        return i >= 0 and self.intervals[i][0] <= val <= self.intervals[i][1]
+
+    def lower(self):
+        """the smallest value"""
+        return self.intervals[0][0]
+
+    def upper(self):
+        """the largest value"""
+        return self.intervals[-1][1]
+
+    def clip(self,lo=None,hi=None):
+        """returns the Interval_domain of the values v with lo <= v <= hi;
+        a bound of None is not checked"""
+        return Interval_domain(intervals=[(ilo if lo is None else max(ilo,lo),
+                                           ihi if hi is None else min(ihi,hi))
+                                          for (ilo,ihi) in self.intervals])
+
+    def split(self):
+        """returns a lower and an upper Interval_domain that partition this one.
+        There must be at least two values."""
+        mid = (self.lower()+self.upper())//2
+        return [self.clip(hi=mid), self.clip(lo=mid+1)]
+
+    def __and__(self,other):
+        if isinstance(other,Interval_domain):
+            return Interval_domain(intervals=[(max(lo,olo),min(hi,ohi))
+                                              for (lo,hi) in self.intervals
+                                              for (olo,ohi) in other.intervals
+                                              if lo <= ohi and olo <= hi])
+        else:
+            return {val for val in other if val in self}
+    __rand__ = __and__
+
+    def __sub__(self,other):
+        if not isinstance(other,Interval_domain):
+            other = Interval_domain(intervals=[(int(val),int(val)) for val in other
+                                               if val in self])
+        result = []
+        for (lo,hi) in self.intervals:
+            for (olo,ohi) in other.intervals:
+                if olo <= hi and lo <= ohi:
+                    if lo < olo:
+                        result.append((lo,olo-1))
+                    lo = ohi+1
+            result.append((lo,hi))
+        return Interval_domain(intervals=result)
+
+    def __rsub__(self,other):
+        return {val for val in other if val not in self}
+
+    def __eq__(self,other):
+        if isinstance(other,Interval_domain):
+            return self.intervals == other.intervals
+        elif isinstance(other,(set,frozenset)):
+            return len(other) == self.size and all(val in self for val in other)
+        return NotImplemented
+    __hash__ = None
+
+    def __le__(self,other):
+        return len(self-other) == 0
+
+    def __repr__(self):
+        return "{"+", ".join(str(lo) if lo == hi else str(lo)+".."+str(hi)
+                             for (lo,hi) in self.intervals)+"}"
+
 class CSP(Displayable):
     """A CSP consists of
     * domains, a dictionary that maps each variable to its domain
@@ -53,6 +594,7 @@ class CSP(Displayable):
         self.domains = domains
         self.constraints = constraints
         self.coordinates = coordinates
+        self.index = None   # Domain_index, created when needed
         self.var_to_const = {var:set() for var in self.variables}
         for con in constraints:
             for var in con.scope:
@@ -66,6 +608,76 @@ class CSP(Displayable):
         """more detailed string representation of CSP"""
         return "CSP("+str(self.domains)+", "+str([str(c) for c in self.constraints])+")"
 
+    def add_constraint(self,con):
+        """adds constraint con; the variables in its scope must be in the CSP"""
+        self.constraints.append(con)
+        for var in con.scope:
+            self.var_to_const[var].add(con)
+
+    def remove_constraint(self,con):
+        """removes constraint con from the CSP"""
+        self.constraints.remove(con)
+        for var in con.scope:
+            self.var_to_const[var].discard(con)
+
+    def compile(self):
+        """compiles each constraint into a Support_table for the domains of the CSP,
+        with the values numbered by the Domain_index of the CSP.
+        Constraints that are already compiled this way are not recompiled.
+        """
+        index = self.domain_index()
+        for con in self.constraints:
+            if (con.table is None or con.table.index is not index
+                    or not con.table.covers(self.domains)):
+                con.compile(self.domains,index)
+
+    def domain_index(self):
+        """returns a Domain_index that numbers the variables and values of the CSP"""
+        if self.index is None:
+            self.index = Domain_index(self.domains)
+        return self.index
+
+    def components(self):
+        """returns a list of the sets of variables in the connected components
+        of the constraint graph; variables are connected if they are in the
+        scope of a common constraint.
+        """
+        components = []
+        unreached = set(self.variables)
+        while unreached:
+            component = self.connected({unreached.pop()})
+            unreached -= component
+            components.append(component)
+        return components
+
+    def connected(self,variables):
+        """returns the set of variables connected to some variable in variables
+        in the constraint graph (including the variables themselves)"""
+        reached = set(variables)
+        to_visit = list(reached)
+        while to_visit:
+            var = to_visit.pop()
+            for con in self.var_to_const[var]:
+                for nvar in con.scope:
+                    if nvar not in reached:
+                        reached.add(nvar)
+                        to_visit.append(nvar)
+        return reached
+
+    def sub_csp(self,variables):
+        """returns the CSP with just the variables in variables and the
+        constraints whose scope is in variables.
+        The constraints are copied so that they can be compiled separately.
+        """
+        constraints = []
+        for con in self.constraints:
+            if all(var in variables for var in con.scope):
+                con = copy.copy(con)
+                con.table = None
+                constraints.append(con)
+        return CSP({var:self.domains[var] for var in self.domains if var in variables},
+                   constraints)
+
     def consistent(self,assignment):
         """returns True if all of the constraints that can be evaluated
         evaluate to True given the assignment.
@@ -0,0 +1,163 @@
+# cspSLS.py - Stochastic Local Search for Solving CSPs
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+import random
+import time
+from utilities import Displayable, argmax, flip
+
+class SLSearcher(Displayable):
+    """A min-conflicts local searcher for a CSP.
+
+    current_assignment is a total assignment. conflicts is the list of
+    constraints that it violates, conflict_pos[con] is the position of con
+    in conflicts, and var_conflicts[var] is the number of those with var in
+    their scope. After a variable is changed, only the constraints on that
+    variable are checked again.
+    The variables, values and constraints are kept in lists in a fixed
+    order, so that a run can be repeated by seeding random.
+    """
+    def __init__(self, csp):
+        self.csp = csp
+        self.variables = sorted(csp.variables, key=str)   # a list so random.choice can be used
+        self.domain_values = {var:sorted(csp.domains[var], key=str) for var in self.variables}
+        self.var_constraints = {var:[] for var in self.variables}  # in the order of csp.constraints
+        for con in csp.constraints:
+            for var in con.scope:
+                self.var_constraints[var].append(con)
+        self.number_of_steps = 0
+        self.number_of_restarts = 0
+        self.restart()
+
+    def restart(self):
+        """creates a new random total assignment and computes its conflicts"""
+        self.current_assignment = {var:random.choice(self.domain_values[var])
+                                   for var in self.variables}
+        self.conflicts = []
+        self.conflict_pos = {}
+        self.var_conflicts = {var:0 for var in self.variables}
+        for con in self.csp.constraints:
+            if not con.holds(self.current_assignment):
+                self.add_conflict(con)
+        self.tabu = {}   # (var,val) -> step until which var cannot be set to val
+        self.best_assignment = dict(self.current_assignment)
+        self.best_num_conflicts = len(self.conflicts)
+        self.display(2,"Restarted with",len(self.conflicts),"conflicts")
+
+    def add_conflict(self,con):
+        self.conflict_pos[con] = len(self.conflicts)
+        self.conflicts.append(con)
+        for var in con.scope:
+            self.var_conflicts[var] += 1
+
+    def remove_conflict(self,con):
+        """removes con from conflicts by moving the last conflict into its place"""
+        pos = self.conflict_pos.pop(con)
+        last = self.conflicts.pop()
+        if last is not con:
+            self.conflicts[pos] = last
+            self.conflict_pos[last] = pos
+        for var in con.scope:
+            self.var_conflicts[var] -= 1
+
+    def assign(self,var,val):
+        """sets var to val in the current assignment and updates the conflicts
+        of the constraints on var"""
+        self.current_assignment[var] = val
+        for con in self.var_constraints[var]:
+            holds = con.holds(self.current_assignment)
+            if con in self.conflict_pos:
+                if holds:
+                    self.remove_conflict(con)
+            elif not holds:
+                self.add_conflict(con)
+
+    def num_conflicts_with(self,var,val):
+        """the number of the constraints on var that are violated if var is
+        changed to val (and the other variables are unchanged)"""
+        old_val = self.current_assignment[var]
+        self.current_assignment[var] = val
+        count = sum(1 for con in self.var_constraints[var]
+                    if not con.holds(self.current_assignment))
+        self.current_assignment[var] = old_val
+        return count
+
+    def search(self, max_steps=1000, max_time=None, prob_walk=0.1,
+               tabu_tenure=0, restart_steps=None):
+        """searches for a solution by changing a variable in a conflict at each step.
+        With probability prob_walk the variable is given a random value
+        (a random walk step); otherwise it is given a value that minimizes
+        the number of its conflicts, ties broken at random.
+        A variable cannot go back to a value it had in the last tabu_tenure
+        steps, unless that gives fewer conflicts than the best assignment so far.
+        If restart_steps is not None, the search restarts from a random
+        assignment when there has been no improvement for restart_steps steps.
+        The search stops after max_steps steps, or after max_time seconds
+        if max_time is not None.
+
+        Returns the number of steps taken if a solution is found; the
+        solution is in current_assignment. Otherwise returns None;
+        best_assignment is then an assignment with the fewest conflicts found.
+        """
+        deadline = None if max_time is None else time.perf_counter()+max_time
+        steps_since_best = 0
+        for i in range(max_steps):
+            if not self.conflicts:
+                self.display(1,"Solution found:",self.current_assignment,
+                             "in",self.number_of_steps,"steps")
+                return self.number_of_steps
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if restart_steps is not None and steps_since_best >= restart_steps:
+                self.number_of_restarts += 1
+                best,best_num = self.best_assignment,self.best_num_conflicts
+                self.restart()
+                if best_num < self.best_num_conflicts:
+                    self.best_assignment,self.best_num_conflicts = best,best_num
+                steps_since_best = 0
+            self.number_of_steps += 1
+            var = random.choice(random.choice(self.conflicts).scope)
+            old_val = self.current_assignment[var]
+            others = len(self.conflicts)-self.var_conflicts[var]
+            candidates = [] if flip(prob_walk) else [
+                (val,-num) for val in self.domain_values[var]
+                for num in [self.num_conflicts_with(var,val)]
+                if self.tabu.get((var,val),0) < self.number_of_steps
+                   or others+num < self.best_num_conflicts]
+            if candidates:
+                val = argmax(candidates)
+                self.display(3,"Min-conflicts step:",var,"=",val)
+            else:   # a random walk step, or all of the values are tabu
+                val = random.choice(self.domain_values[var])
+                self.display(3,"Random walk step:",var,"=",val)
+            if tabu_tenure > 0 and val != old_val:
+                self.tabu[(var,old_val)] = self.number_of_steps+tabu_tenure
+            self.assign(var,val)
+            if len(self.conflicts) < self.best_num_conflicts:
+                self.best_assignment = dict(self.current_assignment)
+                self.best_num_conflicts = len(self.conflicts)
+                steps_since_best = 0
+            else:
+                steps_since_best += 1
+        if not self.conflicts:
+            self.display(1,"Solution found:",self.current_assignment,
+                         "in",self.number_of_steps,"steps")
+            return self.number_of_steps
+        self.display(1,"No solution in",self.number_of_steps,"steps; the best has",
+                     self.best_num_conflicts,"conflicts")
+        return None
+
+from cspExamples import csp1, csp2, crossword1, crossword2d
+
+## Test Solving CSPs with local search:
+#se1 = SLSearcher(csp1); se1.search(100)
+#se2 = SLSearcher(csp2); se2.search(1000, prob_walk=0.2)
+#se3 = SLSearcher(crossword1); se3.search(1000, tabu_tenure=3, restart_steps=200)
+#se4 = SLSearcher(crossword2d); se4.search(100000, max_time=10, prob_walk=0.2, restart_steps=500)
+#se4.current_assignment
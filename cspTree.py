@@ -0,0 +1,195 @@
+# cspTree.py - Solving tree-structured CSPs and cycle-cutset conditioning
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+from collections import deque
+from cspConsistency import Con_solver, select, ordered
+
+class Tree_con_solver(Con_solver):
+    """A Con_solver that uses the structure of the constraint graph.
+
+    The incidence graph of a CSP has a node for each variable and for each
+    constraint, with an arc between a constraint and each variable in its
+    scope. If it has no cycles, the CSP is solved without search: domains are
+    made directionally arc consistent from the leaves towards the roots, and
+    then values are chosen from the roots down, which never needs to backtrack.
+    Otherwise, if a cycle cutset (a set of variables whose removal leaves no
+    cycles) of at most max_cutset variables, with at most max_assignments
+    assignments, is found, the cutset variables are assigned one at a time,
+    with arc consistency after each, and the rest is solved as a tree for
+    each consistent assignment to the cutset.
+    If the cutset is larger, solve_one splits domains as Con_solver does.
+    """
+    def __init__(self, csp, domains=None, engine="ac3", var_order="first",
+                 split="half", max_cutset=10, max_assignments=10000):
+        super().__init__(csp, domains, engine=engine, var_order=var_order,
+                         split=split)
+        self.max_cutset = max_cutset
+        self.max_assignments = max_assignments
+        self.cutset = None   # the cycle cutset, once found
+
+    def solve_one(self,to_do=None):
+        """return a solution to the current CSP or False if there are no solutions
+        to_do is the list of arcs to check
+        """
+        if self.cutset is None:   # the structure has not been analysed yet
+            self.cutset = cycle_cutset(self.csp)
+            if (len(self.cutset) <= self.max_cutset
+                    and self.num_assignments(self.cutset) <= self.max_assignments):
+                return self.solve_with_cutset(self.cutset,to_do)
+            self.display(2,"The cycle cutset",self.cutset,"is too large; splitting domains")
+        return super().solve_one(to_do)
+
+    def solve_with_cutset(self,cutset,to_do=None):
+        """returns a solution or False if there are no solutions, by solving
+        the tree that remains for each assignment to the variables in cutset"""
+        self.make_arc_consistent(to_do)
+        if any(len(self.domains[var])==0 for var in self.domains):
+            return False
+        structure = tree_order(self.csp,set(cutset))
+        if not cutset:
+            self.display(2,"The constraint graph is acyclic")
+            return self.solve_tree(structure)
+        self.display(2,"Conditioning on the cycle cutset",cutset)
+        return self.solve_cutset(cutset,structure)
+
+    def num_assignments(self,variables):
+        """returns the number of assignments to variables given the current domains"""
+        count = 1
+        for var in variables:
+            count *= len(self.domains[var])
+        return count
+
+    def solve_cutset(self,cutset,structure):
+        """returns a solution or False if there are no solutions, by assigning
+        each value of the first variable of cutset in turn, making the domains
+        arc consistent and solving for the rest of cutset. The constraints
+        among the cutset variables are thus checked as soon as they are assigned.
+        When cutset is empty, the tree given by structure is solved.
+        """
+        if not cutset:
+            return self.solve_tree(structure)
+        var = cutset[0]
+        to_do = self.new_to_do(var,None)
+        for val in ordered(self.domains[var]):
+            solver = self.copy_with_assign(var,{val})
+            solver.make_arc_consistent(to_do)
+            if all(len(solver.domains[v])>0 for v in solver.domains):
+                solution = solver.solve_cutset(cutset[1:],structure)
+                if solution:
+                    return solution
+            else:
+                self.display(3,"...",var,"=",val,"has no solution")
+        return False
+
+    def solve_tree(self,structure):
+        """returns a solution or False if there are no solutions, where the
+        variables not in the tree given by structure (see tree_order) have a
+        single value. The domains of the tree variables are changed.
+        """
+        roots,order,checks = structure
+        for const in checks:
+            if not const.holds({var:select(self.domains[var]) for var in const.scope}):
+                return False
+        for (const,parent,children) in reversed(order):
+            new_domain = self.revise(parent,const)
+            if new_domain != self.domains[parent]:
+                self.display(3,"Directional arc consistency: dom(",parent,") =",
+                             new_domain,"due to",const)
+                if not new_domain:
+                    return False
+                self.set_domain(parent,new_domain)
+        solution = {var:select(self.domains[var]) for var in self.domains
+                    if len(self.domains[var])==1}
+        for root in roots:
+            solution[root] = select(self.domains[root])
+        for (const,parent,children) in order:
+            if children:
+                self.domains[parent] = {solution[parent]}
+                support = self.find_support(const,parent,solution[parent])
+                solution.update(zip(const.scope,support))
+                for child in children:
+                    self.domains[child] = {solution[child]}
+        self.display(2,"solution:",solution)
+        return solution
+
+def tree_order(csp,cutset):
+    """returns (roots,order,checks) for the incidence graph of csp without
+    the variables in cutset, which must have no cycles:
+    * roots is a list with a variable in each connected component
+    * order is a list of (const,parent,children) in breadth-first order from
+      the roots, where parent is the variable const was reached from and
+      children are its other variables not in cutset
+    * checks is the list of the constraints with all of their variables in cutset
+    Raises ValueError if there is a cycle.
+    """
+    roots = []
+    order = []
+    parent_const = {}
+    for root in csp.variables - cutset:
+        if root in parent_const:
+            continue
+        roots.append(root)
+        parent_const[root] = None
+        queue = deque([root])
+        while queue:
+            var = queue.popleft()
+            for const in csp.var_to_const[var]:
+                if const is not parent_const[var]:
+                    children = [v for v in const.scope if v != var and v not in cutset]
+                    for child in children:
+                        if child in parent_const:
+                            raise ValueError("the constraint graph has a cycle through "+str(child))
+                        parent_const[child] = const
+                        queue.append(child)
+                    order.append((const,var,children))
+    if len(order) != sum(1 for const in csp.constraints
+                         if not all(v in cutset for v in const.scope)):
+        raise ValueError("the constraint graph has a cycle")
+    checks = [const for const in csp.constraints if all(v in cutset for v in const.scope)]
+    return roots, order, checks
+
+def cycle_cutset(csp):
+    """returns a list of variables whose removal leaves no cycles in the
+    incidence graph of csp; it is empty if there are no cycles.
+    Nodes with at most one neighbour cannot be on a cycle, so they are
+    removed until there are none; then a variable in the most remaining
+    constraints is added to the cutset and removed, and this is repeated.
+    This is greedy, so the cutset found may not be the smallest.
+    """
+    neighbours = {('var',var):{('con',con) for con in csp.var_to_const[var]}
+                  for var in csp.variables}
+    neighbours.update({('con',con):{('var',var) for var in con.scope}
+                       for con in csp.constraints})
+    def remove(node):
+        for other in neighbours.pop(node):
+            neighbours[other].discard(node)
+            to_check.append(other)
+    cutset = []
+    to_check = list(neighbours)
+    while True:
+        while to_check:
+            node = to_check.pop()
+            if node in neighbours and len(neighbours[node]) <= 1:
+                remove(node)
+        remaining = [node for node in neighbours if node[0] == 'var']
+        if not remaining:
+            return cutset
+        node = max(remaining, key=lambda node: len(neighbours[node]))
+        cutset.append(node[1])
+        remove(node)
+
+from cspExamples import csp1, csp2, crossword1, crossword2
+
+## Test solving CSPs using their structure:
+#cycle_cutset(csp1)  # csp1 is a tree
+#Tree_con_solver(csp1).solve_one()
+#cycle_cutset(csp2)
+#Tree_con_solver(csp2).solve_one()  # conditions on the cutset
+#Tree_con_solver(crossword1).solve_one()
@@ -8,7 +8,9 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
-from searchProblem import Path
+from collections import OrderedDict
+from itertools import chain
+from searchProblem import Path, Search_problem
 from utilities import Displayable
 
 class Depth_first_search(Displayable):
@@ -16,22 +18,67 @@ class Depth_first_search(Displayable):
    
     This uses a list of iterators of nodes. "top" is the top-level iterator.
     The frontier contains iterators that may be needed to solve the problem.
+    If budget is a Budget, each node is charged to it, and search returns None
+    with budget_exhausted set when it is used up; the search can be continued
+    by calling search again with a new budget.
+
+    If cycle_pruning is True, a node that is already on the current path is
+    not expanded again. If multiple_path_pruning is True, a node that has
+    already been expanded is not expanded again; at most max_explored nodes
+    are remembered for this (all of them if it is None), the least recently
+    reached being forgotten first. Nodes are compared by problem.node_key,
+    which must then be hashable.
+    Multiple-path pruning can lose paths when the depth bound is hit.
     """
-    def __init__(self, problem, bound=100000):
+    def __init__(self, problem, bound=100000, budget=None, cycle_pruning=False,
+                 multiple_path_pruning=False, max_explored=None):
         self.problem = problem
         self.bound = bound  # default bound unless overridden in search
         self.top = iter(self.problem.start_nodes()) 
         self.frontier = []    # list of iterators that generare all unexplored paths
         self.number_expanded = 0 # number of nodes expanded
         self.hit_depth_bound = False # true when some paths hit the depth-bound
+        self.budget = budget
+        self.budget_exhausted = False # true when the search stopped because of the budget
+        self.cycle_pruning = cycle_pruning
+        self.multiple_path_pruning = multiple_path_pruning
+        self.max_explored = max_explored
+        self.path = []        # keys of the nodes whose neighbours are being generated, when cycle pruning
+        self.on_path = set()  # the keys in path
+        self.explored = OrderedDict()  # keys of the expanded nodes, when multiple-path pruning
+        self.number_cycles_pruned = 0 # number of nodes pruned because they are on the path
+        self.number_paths_pruned = 0  # number of nodes pruned because they were expanded before
 
-    def search(self, bound = None):
+    def search(self, bound = None, budget = None):
         """finds a goal with number of arcs less than bound if there is one.
-        returns None if there is no path to a goal"""
+        returns None if there is no path to a goal, or if the budget is used up"""
         if bound is None: bound = self.bound
+        if budget is not None: self.budget = budget
+        self.budget_exhausted = False
         while True:
             try:
                 node = next(self.top)   #current path
+                if self.budget is not None and self.budget.use():
+                    self.top = chain([node],self.top)  # so that search can continue with it
+                    self.budget_exhausted = True
+                    self.display(1,"DFS stopped:",self.budget.reason,"after",
+                               self.number_expanded,"nodes expanded")
+                    return None
+                if self.cycle_pruning or self.multiple_path_pruning:
+                    key = self.problem.node_key(node)
+                if self.cycle_pruning and key in self.on_path:
+                    self.number_cycles_pruned += 1
+                    self.display(3,"DFS pruning cycle at node",node)
+                    continue
+                if self.multiple_path_pruning:
+                    if key in self.explored:
+                        self.number_paths_pruned += 1
+                        self.explored.move_to_end(key)
+                        self.display(3,"DFS pruning path to expanded node",node)
+                        continue
+                    self.explored[key] = True
+                    if self.max_explored is not None and len(self.explored) > self.max_explored:
+                        self.explored.popitem(last=False)
                 self.number_expanded += 1
                 if self.problem.is_goal(node):
                     self.display(1,"DFS found goal",node,"There were",
@@ -39,6 +86,9 @@ class Depth_first_search(Displayable):
                     return node
                 elif len(self.frontier) < bound:
                     self.frontier.append(self.top)
+                    if self.cycle_pruning:
+                        self.path.append(key)
+                        self.on_path.add(key)
                     self.display(2,"DFS expanding node",node)
                     self.top = self.problem.neighbor_nodes(node)
                 else:
@@ -48,11 +98,132 @@ class Depth_first_search(Displayable):
                 self.display(2,"popping off frontier")
                 if self.frontier:
                     self.top = self.frontier.pop()
+                    if self.cycle_pruning:
+                        self.on_path.discard(self.path.pop())
                 else:
                     self.display(1,"No path found. There were",
                               self.number_expanded,"nodes expanded")
                     return None
 
+class Iterative_deepening_search(Displayable):
+    """returns an iterative-deepening searcher for a problem.
+
+    It does a depth-first search with bound 0, 1, 2, ... so that a goal with
+    the fewest arcs is found, using memory that is linear in the depth.
+    The bound is only increased if the last depth-first search hit it, so
+    the search stops as soon as it has shown that there is no path to a goal.
+    Calling search again continues the current depth-first search, and then
+    deeper ones; goals found at one depth are found again at greater depths.
+    max_bound (if not None) is the largest bound tried. The other arguments
+    are passed to Depth_first_search. Without cycle_pruning, some path on a
+    cyclic graph always hits the bound, so the search only stops without a
+    goal when max_bound is reached.
+    """
+    def __init__(self, problem, max_bound=None, budget=None, cycle_pruning=True):
+        self.problem = problem
+        self.max_bound = max_bound
+        self.budget = budget
+        self.cycle_pruning = cycle_pruning
+        self.bound = 0
+        self.number_expanded = 0 # number of nodes expanded, in all of the iterations
+        self.searcher = self.new_searcher()
+        self.budget_exhausted = False
+
+    def new_searcher(self):
+        """returns a depth-first searcher for the current bound"""
+        self.display(2,"Iterative deepening with bound",self.bound)
+        return Depth_first_search(self.problem, self.bound, budget=self.budget,
+                                  cycle_pruning=self.cycle_pruning)
+
+    def search(self):
+        """returns a goal with the fewest arcs (not found by a previous call)
+        or None if there is none"""
+        while True:
+            expanded = self.searcher.number_expanded
+            node = self.searcher.search()
+            self.number_expanded += self.searcher.number_expanded-expanded
+            self.budget_exhausted = self.searcher.budget_exhausted
+            if node is not None or self.budget_exhausted:
+                return node
+            if not self.searcher.hit_depth_bound:
+                self.display(1,"No path found: no path hit the bound",self.bound)
+                return None
+            if self.max_bound is not None and self.bound >= self.max_bound:
+                self.display(1,"No path found with at most",self.max_bound,"arcs")
+                return None
+            self.bound += 1
+            self.searcher = self.new_searcher()
+
+class Cost_bounded_problem(Search_problem):
+    """The search problem whose nodes are the paths of problem for which the
+    cost plus the heuristic value of the end is at most bound.
+    next_bound is the least such value that is greater than bound.
+    If cycle_pruning is True, paths that visit a node twice are left out.
+    """
+    def __init__(self, problem, bound, cycle_pruning=False):
+        self.problem = problem
+        self.bound = bound
+        self.cycle_pruning = cycle_pruning
+        self.next_bound = float('inf')
+
+    def within_bound(self,path):
+        """is True if the value of path is at most bound;
+        otherwise next_bound is updated"""
+        value = path.cost+self.problem.heuristic(path.end())
+        if value <= self.bound:
+            return True
+        self.next_bound = min(self.next_bound,value)
+        return False
+
+    def start_nodes(self):
+        return [path for path in (Path(node) for node in self.problem.start_nodes())
+                if self.within_bound(path)]
+
+    def is_goal(self,path):
+        return self.problem.is_goal(path.end())
+
+    def neighbor_nodes(self,path):
+        for arc in self.problem.neighbors(path.end()):
+            if not (self.cycle_pruning and arc.to_node in path.nodes()):
+                new_path = Path(path,arc)
+                if self.within_bound(new_path):
+                    yield new_path
+
+class IDA_star_search(Displayable):
+    """returns an iterative-deepening A* searcher for a problem.
+
+    It does a depth-first search of the paths whose cost plus the heuristic
+    value of their end is at most a bound, starting with the least such
+    value of a start node. If no goal is found, the bound is increased to
+    the least value that was over it. With an admissible heuristic, the
+    first path found has the least cost; memory is linear in the depth.
+    search returns a Path, or None if there is none.
+    """
+    def __init__(self, problem, depth_bound=100000, budget=None, cycle_pruning=True):
+        self.problem = problem
+        self.depth_bound = depth_bound
+        self.budget = budget
+        self.cycle_pruning = cycle_pruning
+        self.number_expanded = 0 # number of paths expanded, in all of the iterations
+        self.budget_exhausted = False
+
+    def search(self):
+        """returns a path to a goal with the least cost, or None if there is none"""
+        bound = min((self.problem.heuristic(node) for node in self.problem.start_nodes()),
+                    default=float('inf'))
+        while bound < float('inf'):
+            self.display(2,"IDA* with cost bound",bound)
+            bounded = Cost_bounded_problem(self.problem, bound, self.cycle_pruning)
+            searcher = Depth_first_search(bounded, self.depth_bound, budget=self.budget)
+            path = searcher.search()
+            self.number_expanded += searcher.number_expanded
+            self.budget_exhausted = searcher.budget_exhausted
+            if path is not None or self.budget_exhausted:
+                return path
+            bound = bounded.next_bound
+        self.display(1,"No path found. There were",self.number_expanded,"paths expanded")
+        return None
+
 # example queries:
 # from searchDepthFirst import Depth_first_search
 # import searchProblem 
@@ -62,4 +233,15 @@ class Depth_first_search(Displayable):
 # print(searcher2.search())        # find next path
 # searcher3 = Depth_first_search(searchProblem.cyclic_delivery_problem)
 # s3=searcher3.search()       # find next path - will go forever(?)
+# searcher3c = Depth_first_search(searchProblem.cyclic_delivery_problem, cycle_pruning=True)
+# print(searcher3c.search(), searcher3c.number_cycles_pruned)
+# searcher3m = Depth_first_search(searchProblem.cyclic_delivery_problem, multiple_path_pruning=True)
+# print(searcher3m.search(), searcher3m.number_paths_pruned)
+# searcher5 = Iterative_deepening_search(searchProblem.cyclic_delivery_problem)
+# print(searcher5.search(), searcher5.number_expanded)   # fewest arcs
+# searcher6 = IDA_star_search(searchProblem.cyclic_delivery_problem)
+# print(searcher6.search())   # least cost
+# from utilities import Budget
+# searcher4 = Depth_first_search(searchProblem.cyclic_delivery_problem, budget=Budget(max_nodes=1000))
+# print(searcher4.search(), searcher4.budget_exhausted)  # stops after 1000 nodes
 
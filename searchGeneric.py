@@ -0,0 +1,119 @@
+# searchGeneric.py - Best-first searchers (A*, greedy best-first, uniform cost)
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+import heapq
+from searchProblem import Path
+from utilities import Displayable
+
+class Frontier_pq(object):
+    """A frontier of paths ordered by a value, as a priority queue.
+    Paths with the same value are removed in the order they were added.
+    """
+    def __init__(self):
+        self.frontier_index = 0  # the number of paths ever added
+        self.frontierpq = []     # heap of (value,index,path)
+
+    def empty(self):
+        """is True if the frontier has no paths"""
+        return self.frontierpq == []
+
+    def add(self,path,value):
+        """adds path with value to the frontier"""
+        self.frontier_index += 1   # a new unique index, so paths are never compared
+        heapq.heappush(self.frontierpq,(value,self.frontier_index,path))
+
+    def pop(self):
+        """removes and returns a path with the least value"""
+        (_,_,path) = heapq.heappop(self.frontierpq)
+        return path
+
+    def __len__(self):
+        return len(self.frontierpq)
+
+    def __repr__(self):
+        """string representation of the frontier"""
+        return str([(value,path) for (value,_,path) in sorted(self.frontierpq)])
+
+class Best_first_search(Displayable):
+    """A searcher that expands the path on the frontier with the least value,
+    where the value of a path is given by the priority method.
+    Paths can be found by repeatedly calling search().
+
+    If multiple_path_pruning is True, a path is not expanded if a path to
+    the same node has already been expanded; this keeps the optimality of
+    A* when the heuristic is consistent.
+    """
+    def __init__(self, problem, multiple_path_pruning=False):
+        self.problem = problem
+        self.frontier = Frontier_pq()
+        self.number_expanded = 0   # number of paths expanded
+        self.multiple_path_pruning = multiple_path_pruning
+        self.explored = set()      # the nodes at the end of expanded paths
+        for node in problem.start_nodes():
+            self.add_to_frontier(Path(node))
+
+    def priority(self,path):
+        """returns the value of path; the path with the least value is expanded first"""
+        raise NotImplementedError("priority")   # abstract method
+
+    def add_to_frontier(self,path):
+        self.frontier.add(path,self.priority(path))
+
+    def search(self):
+        """returns the (next) path from a start node to a goal node.
+        Returns None if there are no (more) paths.
+        """
+        while not self.frontier.empty():
+            path = self.frontier.pop()
+            if self.multiple_path_pruning:
+                if path.end() in self.explored:
+                    continue
+                self.explored.add(path.end())
+            self.display(2,"Expanding:",path,"(cost:",path.cost,")")
+            self.number_expanded += 1
+            if self.problem.is_goal(path.end()):
+                self.display(1,"Found goal",path.end(),"with cost",path.cost,
+                             "There were",self.number_expanded,"paths expanded and",
+                             len(self.frontier),"paths remain in the frontier")
+                return path
+            for arc in self.problem.neighbors(path.end()):
+                self.add_to_frontier(Path(path,arc))
+            self.display(3,"Frontier:",self.frontier)
+        self.display(1,"No (more) paths. There were",
+                     self.number_expanded,"paths expanded")
+        return None
+
+class A_star_search(Best_first_search):
+    """expands the path with the least cost plus heuristic value of its end"""
+    def priority(self,path):
+        return path.cost+self.problem.heuristic(path.end())
+
+class Greedy_best_first_search(Best_first_search):
+    """expands the path whose end has the least heuristic value"""
+    def priority(self,path):
+        return self.problem.heuristic(path.end())
+
+class Uniform_cost_search(Best_first_search):
+    """expands the path with the least cost"""
+    def priority(self,path):
+        return path.cost
+
+# example queries:
+# from searchGeneric import A_star_search, Greedy_best_first_search, Uniform_cost_search
+# import searchProblem
+# searcher1 = A_star_search(searchProblem.acyclic_delivery_problem)
+# print(searcher1.search())        # find first path
+# print(searcher1.search())        # find next path
+# searcher2 = Uniform_cost_search(searchProblem.problem1)
+# print(searcher2.search())
+# searcher3 = A_star_search(searchProblem.cyclic_delivery_problem, multiple_path_pruning=True)
+# print(searcher3.search(), searcher3.number_expanded)
+# searcher4 = Greedy_best_first_search(searchProblem.cyclic_delivery_problem)
+# print(searcher4.search())        # greedy can go around a cycle forever
@@ -0,0 +1,164 @@
+# searchGraphFile.py - Reading and writing large search graphs
+# Python 3 code. Full documentation at http://artint.info/code/python/code.pdf
+
+# Artificial Intelligence: Foundations of Computational Agents
+# http://artint.info
+# Copyright David L Poole and Alan K Mackworth 2016.
+# This work is licensed under a Creative Commons
+# Attribution-NonCommercial-ShareAlike 4.0 International License.
+# See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+import csv
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from searchProblem import Search_problem_from_compact_graph
+
+def load_edge_list(filename, starts=[], goals=set(), hmap={}, delimiter=None, header=False):
+    """returns a Search_problem_from_compact_graph for the edge list in filename.
+    Each line is from_node,to_node,cost or from_node,to_node (with cost 1).
+    The delimiter is a tab if filename ends in .tsv and a comma otherwise,
+    unless it is given. If header is True, the first line is skipped.
+    Blank lines and lines starting with # are ignored. Nodes are strings.
+    The lines are read one at a time straight into the arrays of the problem.
+    """
+    if delimiter is None:
+        delimiter = '\t' if filename.endswith('.tsv') else ','
+    with open(filename, newline='') as file:
+        reader = csv.reader(file, delimiter=delimiter)
+        if header:
+            next(reader, None)
+        return Search_problem_from_compact_graph(edges=read_edges(reader),
+                                                 starts=starts, goals=goals, hmap=hmap)
+
+def read_edges(reader):
+    """generates the (from_node,to_node,cost) tuples of the rows of a csv reader"""
+    for row in reader:
+        if not row or row[0].startswith('#'):
+            continue
+        if len(row) == 2:
+            yield (row[0], row[1], 1)
+        else:
+            try:
+                cost = float(row[2])
+            except (IndexError, ValueError):
+                raise ValueError("line "+str(reader.line_num)+": expected from,to[,cost] but got "
+                                 +str(row)) from None
+            if not cost >= 0:   # also rejects nan
+                raise ValueError("line "+str(reader.line_num)+": cost cannot be negative, got "
+                                 +str(row))
+            yield (row[0], row[1], cost)
+
+# The binary graph format. All numbers are little-endian.
+#  header:   magic, version, number of nodes n, number of arcs m, length of names
+#  offsets:  n+1 64-bit integers; the arcs from node i are at offsets[i] to offsets[i+1]-1
+#  targets:  m 32-bit integers, padded to a multiple of 8 bytes
+#  costs:    m 64-bit floats
+#  name_offsets: n+1 64-bit integers; node i is names[name_offsets[i]:name_offsets[i+1]]
+#  names:    the nodes as UTF-8, in sorted order, so node i is the ith smallest
+header_format = struct.Struct('<4sIqqq')
+magic = b'AIGR'
+version = 1
+
+def save_graph(problem, filename):
+    """writes problem, a Search_problem_from_compact_graph whose nodes are
+    strings, to filename in the binary graph format. Start nodes, goals and
+    heuristic values are not saved."""
+    names = [problem.node_name(i) for i in range(problem.num_nodes())]
+    assert all(isinstance(name, str) for name in names), "Nodes must be strings"
+    order = sorted(range(len(names)), key=names.__getitem__)  # new number -> old number
+    new_id = array('i', bytes(4*len(order)))
+    for num, old in enumerate(order):
+        new_id[old] = num
+    offsets = array('q', [0])
+    targets = array('i')
+    costs = array('d')
+    for old in order:
+        for pos in range(problem.offsets[old], problem.offsets[old+1]):
+            targets.append(new_id[problem.targets[pos]])
+            costs.append(problem.costs[pos])
+        offsets.append(len(targets))
+    if len(targets) % 2:
+        targets.append(0)   # padding, so that costs are aligned
+    encoded = [names[old].encode('utf-8') for old in order]
+    name_offsets = array('q', [0])
+    for name in encoded:
+        name_offsets.append(name_offsets[-1]+len(name))
+    with open(filename, 'wb') as file:
+        file.write(header_format.pack(magic, version, len(order), len(costs), name_offsets[-1]))
+        for arr in (offsets, targets, costs, name_offsets):
+            if sys.byteorder == 'big':
+                arr.byteswap()
+            arr.tofile(file)
+        for name in encoded:
+            file.write(name)
+
+class Search_problem_from_graph_file(Search_problem_from_compact_graph):
+    """A search problem for a graph in the binary graph format (see save_graph).
+    The file is memory mapped rather than read, so opening is fast and
+    processes that open the same file share one copy in the page cache.
+    Nodes are found by binary search in the sorted names.
+    The costs are stored as floats, so the arcs have float costs.
+    """
+    def __init__(self, filename, starts=[], goals=set(), hmap={}):
+        if sys.byteorder == 'big':
+            raise ValueError("graph files can only be mapped on little-endian machines")
+        with open(filename, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (file_magic, file_version, num_nodes, num_arcs, names_length
+         ) = header_format.unpack_from(self.map)
+        if file_magic != magic or file_version != version:
+            raise ValueError(filename+" is not a graph file of version "+str(version))
+        view = memoryview(self.map)
+        start = header_format.size
+        def section(typecode, length):
+            nonlocal start
+            size = struct.calcsize(typecode)*length
+            part = view[start:start+size].cast(typecode)
+            start += size
+            return part
+        self.offsets = section('q', num_nodes+1)
+        self.targets = section('i', num_arcs+num_arcs%2)[:num_arcs]
+        self.costs = section('d', num_arcs)
+        self.node_names = Sorted_names(section('q', num_nodes+1), view[start:start+names_length])
+        self.starts = starts
+        self.goals = goals
+        self.hmap = hmap
+
+    def node_id(self,node):
+        """returns the number of node, by binary search"""
+        num = bisect_left(self.node_names, node)
+        if num == len(self.node_names) or self.node_names[num] != node:
+            raise KeyError(node)
+        return num
+
+    def intern(self,node):
+        raise TypeError("a graph file cannot be changed")
+
+    def close(self):
+        """releases the memory map; the problem cannot be used after this"""
+        self.offsets = self.targets = self.costs = self.node_names = None
+        self.map.close()
+
+class Sorted_names(object):
+    """the sequence of node names of a graph file, where name i is the
+    UTF-8 in names[offsets[i]:offsets[i+1]]"""
+    def __init__(self, offsets, names):
+        self.offsets = offsets
+        self.names = names
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self,num):
+        return str(self.names[self.offsets[num]:self.offsets[num+1]], 'utf-8')
+
+# example queries:
+# from searchGraphFile import load_edge_list, save_graph, Search_problem_from_graph_file
+# from searchGeneric import A_star_search
+# problem = load_edge_list("roads.tsv", starts=["o103"], goals={"r123"})
+# save_graph(problem, "roads.graph")
+# problem = Search_problem_from_graph_file("roads.graph", starts=["o103"], goals={"r123"})
+# print(A_star_search(problem, multiple_path_pruning=True).search())
@@ -8,6 +8,8 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: http://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
+from array import array
+
 class Search_problem(object):
     """A search problem consists of:
     * a set of start nodes
@@ -33,6 +35,12 @@ class Search_problem(object):
         Returns 0 if not overridden."""
         return 0
 
+    def node_key(self,node):
+        """returns a hashable key that is equal for nodes that are the same,
+        used by searchers that prune cycles or multiple paths.
+        Returns node if not overridden."""
+        return node
+
 class Arc(object):
     """An arc has a from_node and a to_node node and a (non-negative) cost"""
     def __init__(self, from_node, to_node, cost=1, action=None):
@@ -102,6 +110,122 @@ class Search_problem_from_explicit_graph(Search_problem):
         """returns an iterator over the neighbors of node"""
         return (path.to_node for path in self.neighs[node])
 
+class Search_problem_from_compact_graph(Search_problem):
+    """A search problem for a large explicit graph, stored compactly.
+    It is given:
+    * nodes, an iterable of nodes (nodes that are in edges can be omitted)
+    * edges, an iterable of (from_node,to_node,cost) or (from_node,to_node)
+      tuples, where the cost is 1 if omitted
+    * a list or set of start nodes
+    * a list or set of goal nodes
+    * a dictionary that maps each node into its heuristic value.
+    Nodes are numbered in the order they are first seen; node_id and
+    node_name convert between nodes and numbers. The arcs from node number i
+    are stored at positions offsets[i] to offsets[i+1]-1 of the arrays
+    targets (the numbers of the nodes they go to) and costs, in the order
+    they were given (compressed sparse row form). Arc objects are only
+    created when neighbors is called. The costs are stored as integers if
+    they are all integral, and as floats otherwise.
+    """
+    def __init__(self, nodes=(), edges=(), starts=[], goals=set(), hmap={}):
+        self.node_names = []   # node number -> node
+        self.node_ids = {}     # node -> node number
+        for node in nodes:
+            self.intern(node)
+        from_ids = array('i')
+        to_ids = array('i')
+        edge_costs = array('d')
+        integral = True   # all of the costs are integers
+        for edge in edges:
+            from_ids.append(self.intern(edge[0]))
+            to_ids.append(self.intern(edge[1]))
+            edge_costs.append(edge[2] if len(edge) > 2 else 1)
+            integral = integral and edge_costs[-1].is_integer()
+        assert min(edge_costs, default=0) >= 0, "Costs cannot be negative"
+        if integral:
+            edge_costs = array('q', map(int, edge_costs))
+        self.offsets, self.targets, self.costs = csr_arrays(len(self.node_names),
+                                                            from_ids, to_ids, edge_costs)
+        self.starts = starts
+        self.goals = goals
+        self.hmap = hmap
+
+    def intern(self,node):
+        """returns the number of node, giving it the next number if it is new"""
+        num = self.node_ids.get(node)
+        if num is None:
+            num = self.node_ids[node] = len(self.node_names)
+            self.node_names.append(node)
+        return num
+
+    def node_id(self,node):
+        """returns the number of node"""
+        return self.node_ids[node]
+
+    def node_name(self,num):
+        """returns the node with number num"""
+        return self.node_names[num]
+
+    def num_nodes(self):
+        return len(self.offsets)-1
+
+    def num_arcs(self):
+        return len(self.targets)
+
+    def start_nodes(self):
+        """returns list of start nodes"""
+        return self.starts
+
+    def is_goal(self,node):
+        """is True if node is a goal"""
+        return node in self.goals
+
+    def neighbors(self,node):
+        """returns the list of arcs from node"""
+        num = self.node_id(node)
+        return [Arc(node, self.node_name(self.targets[i]), self.costs[i])
+                for i in range(self.offsets[num],self.offsets[num+1])]
+
+    def neighbor_nodes(self,node):
+        """returns an iterator over the neighbors of node"""
+        num = self.node_id(node)
+        return (self.node_name(self.targets[i])
+                for i in range(self.offsets[num],self.offsets[num+1]))
+
+    def heuristic(self,node):
+        """Gives the heuristic value of node n.
+        Returns 0 if not overridden in the hmap."""
+        if node in self.hmap:
+            return self.hmap[node]
+        else:
+            return 0
+
+    def __repr__(self):
+        """returns a string representation of the search problem"""
+        return (type(self).__name__+"("+str(self.num_nodes())+" nodes, "
+                +str(self.num_arcs())+" arcs)")
+
+def csr_arrays(num_nodes, from_ids, to_ids, edge_costs):
+    """returns (offsets,targets,costs) arrays in compressed sparse row form
+    for the arcs from from_ids[k] to to_ids[k] with cost edge_costs[k].
+    The arcs from each node stay in the order they are given.
+    costs has the same type code as edge_costs.
+    """
+    offsets = array('q',bytes(8*(num_nodes+1)))
+    for num in from_ids:
+        offsets[num+1] += 1
+    for num in range(num_nodes):
+        offsets[num+1] += offsets[num]
+    targets = array('i',bytes(4*len(to_ids)))
+    costs = array(edge_costs.typecode,bytes(edge_costs.itemsize*len(edge_costs)))
+    next_pos = offsets[:-1]   # where the next arc from each node goes
+    for k,num in enumerate(from_ids):
+        pos = next_pos[num]
+        targets[pos] = to_ids[k]
+        costs[pos] = edge_costs[k]
+        next_pos[num] = pos+1
+    return offsets, targets, costs
+
 class Path(object):
     """A path is either a node or a path followed by an arc"""
     
@@ -257,3 +381,10 @@ cyclic_delivery_problem = Search_problem_from_explicit_graph(
         }
     )
 
+# the cyclic delivery problem stored compactly
+compact_delivery_problem = Search_problem_from_compact_graph(
+    cyclic_delivery_problem.nodes,
+    ((arc.from_node, arc.to_node, arc.cost) for arc in cyclic_delivery_problem.arcs),
+    starts = cyclic_delivery_problem.starts,
+    goals = cyclic_delivery_problem.goals,
+    hmap = cyclic_delivery_problem.hmap)
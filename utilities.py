@@ -154,6 +154,56 @@ def dict_union(d1,d2):
     d = dict(d1)    # copy d1
     d.update(d2)
     return d
+
+import time
+from threading import Event
+
+class Budget(object):
+    """Limits on the work of a search. A limit of None is not checked.
+    * max_nodes is the number of nodes
+    * max_checks is the number of constraint checks
+    * max_time is the wall-clock time in seconds, from when the budget is created
+    * cancel is a threading.Event; another thread can stop the search by
+      calling cancel.set()
+    * parent is a Budget that is also charged, e.g., an overall budget for
+      a sequence of searches that each have their own budget
+    reason is None until the budget is used up, when it says which limit stopped it.
+    """
+    def __init__(self, max_nodes=None, max_checks=None, max_time=None,
+                 cancel=None, parent=None):
+        self.max_nodes = max_nodes
+        self.max_checks = max_checks
+        self.deadline = None if max_time is None else time.perf_counter()+max_time
+        self.cancel = cancel if cancel is not None else Event()
+        self.parent = parent
+        self.nodes = 0
+        self.first_checks = None   # the number of checks when first used
+        self.reason = None
+
+    def use(self,checks=None):
+        """counts a node, where checks (if given) is the number of constraint
+        checks done so far by the solver. Returns the reason if the budget
+        (or its parent) is used up, and None otherwise."""
+        if self.parent is not None and self.parent.use(checks):
+            self.reason = self.parent.reason
+        elif self.cancel.is_set():
+            self.reason = "cancelled"
+        else:
+            self.nodes += 1
+            if checks is not None and self.first_checks is None:
+                self.first_checks = checks
+            if self.max_nodes is not None and self.nodes > self.max_nodes:
+                self.reason = "node limit"
+            elif (self.max_checks is not None and checks is not None
+                  and checks-self.first_checks > self.max_checks):
+                self.reason = "check limit"
+            elif self.deadline is not None and time.perf_counter() > self.deadline:
+                self.reason = "time limit"
+        return self.reason
+
+class Budget_exhausted(Exception):
+    """raised to stop a search when its Budget is used up"""
+    pass
     
 import json
 def cspToJson(cspObject):